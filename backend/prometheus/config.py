@@ -1,3 +1,4 @@
+import functools
 import os
 import re
 from pathlib import Path
@@ -15,6 +16,9 @@ class Settings(BaseSettings):
         database_path (str): Path to the database directory for persistence.
         log_level (str): Logging level (e.g., INFO, DEBUG).
         debug (bool): Whether to enable debug mode.
+        setting_cache_ttl (float): Seconds to cache setting values in memory (0 disables).
+        log_queue_size (int): Log records buffered for the writer thread before new
+            ones are dropped.
     """
 
     ollama_base_url: str = "http://localhost:11434"
@@ -25,6 +29,10 @@ class Settings(BaseSettings):
     database_path: str = "/root/.prometheus"
     log_level: str = "INFO"
     debug: bool = False
+    # Seconds get_setting() keeps a value in memory (0 disables the cache)
+    setting_cache_ttl: float = 30.0
+    # Log records waiting for the background writer; further records are dropped
+    log_queue_size: int = 10000
 
     # Self-improvement features
     auto_run_tests: bool = True
@@ -51,12 +59,20 @@ class Settings(BaseSettings):
 
 settings = Settings()
 
+# The /host_home mount is fixed when the container starts, so check for it once
+# instead of stat()ing it on every path translation.
+_IN_DOCKER = Path("/host_home").exists()
+_HOME_RE = re.compile(r"^/home/([^/]+)(/.*)?$")
 
+
+@functools.lru_cache(maxsize=256)
 def translate_host_path_to_container(path: str) -> str:
     """Translate a host filesystem path to a container path.
 
     Inside Docker, the user's home directory is mounted at /host_home.
     This function converts paths like /home/username/... to /host_home/...
+    Results are memoized, since every tool call translates the same few
+    workspace paths.
 
     Args:
         path: The path to translate (may be host or container path).
@@ -68,24 +84,24 @@ def translate_host_path_to_container(path: str) -> str:
         return settings.workspace_path
 
     # Check if it's already a container path
-    if path.startswith("/host_home") or path.startswith("/default_workspace"):
+    if path.startswith(("/host_home", "/default_workspace")):
         return path
 
     # Check if /host_home mount exists (indicates we're in Docker)
-    if not Path("/host_home").exists():
+    if not _IN_DOCKER:
         # Not in Docker, return path as-is
         return path
 
     # Match /home/username/... pattern
-    home_pattern = re.match(r"^/home/([^/]+)(/.*)?$", path)
+    home_pattern = _HOME_RE.match(path)
     if home_pattern:
         # Convert to /host_home path
         subpath = home_pattern.group(2) or ""
         return f"/host_home{subpath}"
 
     # Match ~ or $HOME patterns (shouldn't normally come from frontend but handle anyway)
-    if path.startswith("~"):
-        return path.replace("~", "/host_home", 1)
+    if path[:1] == "~":
+        return "/host_home" + path[1:]
 
     # Return as-is for other paths
     return path
@@ -1,18 +1,29 @@
 """SQLite database setup and models for chat persistence and rules."""
+import asyncio
 import base64
-import json
+import binascii
+import functools
 import os
-from datetime import datetime, timezone
+import re
+import time
+from collections.abc import AsyncIterator
 from pathlib import Path
 from typing import Any
 
 import aiosqlite
+import orjson
+import structlog
+from cryptography.exceptions import InvalidTag
 from cryptography.fernet import Fernet
 from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 
 from prometheus.config import settings
 
+logger = structlog.get_logger()
+
 # Database path - configurable via environment variable
 DB_PATH = Path(settings.database_path) / "prometheus.db"
 
@@ -29,6 +40,32 @@ SENSITIVE_KEYS = {
     "github_token",
 }
 
+# One case-insensitive alternation over SENSITIVE_KEYS: a single C-level scan per
+# key instead of a Python loop of substring checks
+_SENSITIVE_RE = re.compile("|".join(map(re.escape, SENSITIVE_KEYS)), re.IGNORECASE)
+
+# PBKDF2 cost for deriving the settings key. Changing it changes the derived key,
+# which would make previously encrypted settings unreadable.
+_KDF_ITERATIONS = 480000
+
+# Written by earlier versions, which cached the derived key on disk
+_LEGACY_KEY_CACHE_PATH = DB_PATH.parent / ".fernet_key"
+
+
+def _is_fernet_key(key: bytes) -> bool:
+    """Check whether a value is a usable Fernet key.
+
+    Args:
+        key: Candidate key.
+
+    Returns:
+        bool: True if key is url-safe base64 encoding exactly 32 bytes.
+    """
+    try:
+        return len(base64.urlsafe_b64decode(key)) == 32
+    except Exception:
+        return False
+
 
 def _get_encryption_key() -> bytes:
     """Get or generate encryption key for sensitive settings.
@@ -43,17 +80,19 @@ def _get_encryption_key() -> bytes:
     Returns:
         bytes: Fernet encryption key.
     """
-    import structlog
-
-    logger = structlog.get_logger()
     env_key = os.getenv("ENCRYPTION_KEY")
     if env_key:
-        # If provided as base64, decode it
+        # A Fernet key (base64 of 32 bytes) is used directly, with no KDF work
+        if _is_fernet_key(env_key.encode()):
+            return env_key.encode()
+        # A Fernet key that was base64-encoded once more is also accepted
         try:
-            return base64.urlsafe_b64decode(env_key.encode())
+            decoded = base64.urlsafe_b64decode(env_key.encode())
         except Exception:
-            # If not base64, derive key from it
-            pass
+            decoded = b""
+        if _is_fernet_key(decoded):
+            return decoded
+        # Anything else is treated as a password and run through the KDF
 
     # Derive key from environment or default salt
     # WARNING: Default salt is for development only
@@ -65,59 +104,128 @@ def _get_encryption_key() -> bytes:
         )
     password = (env_key or "prometheus_default_password").encode()
 
+    # Derived once per process and kept in memory only; storing it (or a fast
+    # hash of the password) on disk would expose it to anyone who copies the data
     kdf = PBKDF2HMAC(
         algorithm=hashes.SHA256(),
         length=32,
         salt=salt,
-        iterations=480000,
+        iterations=_KDF_ITERATIONS,
     )
-    key = base64.urlsafe_b64encode(kdf.derive(password))
-    return key
-
-
-_fernet = Fernet(_get_encryption_key())
+    return base64.urlsafe_b64encode(kdf.derive(password))
 
 
-def _encrypt_value(value: str) -> str:
+_encryption_key = _get_encryption_key()
+# Fernet is kept only to migrate values written before the switch to AES-GCM
+_fernet = Fernet(_encryption_key)
+# AES-GCM is a single AES-NI/CLMUL pass per value, versus Fernet's AES-CBC plus a
+# separate HMAC pass; it uses its own subkey rather than reusing Fernet's key bytes.
+_aead = AESGCM(
+    HKDF(
+        algorithm=hashes.SHA256(),
+        length=32,
+        salt=None,
+        info=b"prometheus settings aes-gcm",
+    ).derive(base64.urlsafe_b64decode(_encryption_key))
+)
+
+# Tag on every value written by _encrypt_value; untagged values are plaintext.
+_ENC_PREFIX = b"enc1:"
+_NONCE_SIZE = 12
+_TAG_SIZE = 16
+# Everything _decrypt_value raises for a value that cannot be read back
+_DECRYPT_ERRORS = (InvalidTag, ValueError, binascii.Error)
+# First byte of a decoded pre-tag AES-GCM value. Fernet tokens always start with 0x80.
+_LEGACY_AESGCM_VERSION = b"\x01"
+
+
+def _encrypt_value(value: bytes) -> bytes:
     """Encrypt a sensitive value.
 
+    Works on bytes so callers convert to/from str only once, at the DB boundary.
+
     Args:
-        value: Plaintext value to encrypt.
+        value: Plaintext value to encrypt (UTF-8 encoded).
 
     Returns:
-        str: Encrypted value (base64 encoded).
+        bytes: Encrypted value (enc1: prefix, then base64 of nonce and ciphertext).
     """
-    return _fernet.encrypt(value.encode()).decode()
+    nonce = os.urandom(_NONCE_SIZE)
+    ciphertext = _aead.encrypt(nonce, value, None)
+    return _ENC_PREFIX + base64.urlsafe_b64encode(nonce + ciphertext)
 
 
-def _decrypt_value(encrypted_value: str) -> str:
+def _decrypt_value(encrypted_value: bytes) -> bytes:
     """Decrypt a sensitive value.
 
+    Values without the enc1: prefix are returned unchanged, since they were
+    stored as plaintext, unless they are pre-tag tokens the migration could not
+    decrypt.
+
     Args:
-        encrypted_value: Encrypted value (base64 encoded).
+        encrypted_value: Value as stored in the settings table (UTF-8 encoded).
 
     Returns:
-        str: Decrypted plaintext value.
+        bytes: Decrypted plaintext value (UTF-8 encoded).
 
     Raises:
-        ValueError: If decryption fails (value may not be encrypted).
+        cryptography.exceptions.InvalidTag: If the value was tampered with or the
+            key changed.
+        binascii.Error: If a tagged value is not valid base64.
+        ValueError: If a tagged value is too short to hold a nonce and tag.
     """
-    import structlog
+    if not encrypted_value.startswith(_ENC_PREFIX):
+        if _is_legacy_token(encrypted_value):
+            raise InvalidTag()
+        return encrypted_value
+    raw = base64.urlsafe_b64decode(encrypted_value[len(_ENC_PREFIX) :])
+    if len(raw) < _NONCE_SIZE + _TAG_SIZE:
+        raise ValueError("Encrypted value is truncated")
+    return _aead.decrypt(raw[:_NONCE_SIZE], raw[_NONCE_SIZE:], None)
+
+
+def _is_legacy_token(value: bytes) -> bool:
+    """Check whether an untagged value has the shape of a pre-tag ciphertext.
+
+    Args:
+        value: Untagged value as stored in the settings table.
 
-    logger = structlog.get_logger()
+    Returns:
+        bool: True for a Fernet token or a version-byte AES-GCM value.
+    """
     try:
-        return _fernet.decrypt(encrypted_value.encode()).decode()
-    except Exception as e:
-        # If decryption fails, log warning but return value for backward compatibility
-        # This handles cases where values were stored before encryption was added
-        logger.warning(
-            "Decryption failed - value may not be encrypted or key changed",
-            error=str(e),
-            value_preview=encrypted_value[:20] + "..." if len(encrypted_value) > 20 else encrypted_value,
-        )
-        return encrypted_value
+        raw = base64.b64decode(value, altchars=b"-_", validate=True)
+    except (binascii.Error, ValueError):
+        return False
+    if raw[:1] == b"\x80":
+        # Version, timestamp, IV, whole AES blocks, HMAC
+        return len(raw) >= 73 and (len(raw) - 57) % 16 == 0
+    # Version, nonce, ciphertext with its 16-byte tag
+    return raw[:1] == _LEGACY_AESGCM_VERSION and len(raw) >= 1 + _NONCE_SIZE + _TAG_SIZE
 
 
+def _decrypt_legacy_value(encrypted_value: bytes) -> bytes | None:
+    """Decrypt a value written before values were tagged with enc1:.
+
+    Args:
+        encrypted_value: Untagged value (Fernet token or version-byte AES-GCM).
+
+    Returns:
+        bytes | None: Decrypted value, or None if it was never encrypted.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(encrypted_value)
+        if raw[:1] == _LEGACY_AESGCM_VERSION:
+            nonce = raw[1 : 1 + _NONCE_SIZE]
+            return _aead.decrypt(nonce, raw[1 + _NONCE_SIZE :], None)
+        return _fernet.decrypt(encrypted_value)
+    except Exception:
+        return None
+
+
+# Setting keys come from a small, repeating set, so memoizing the match avoids
+# re-running the case-insensitive alternation on every lookup.
+@functools.lru_cache(maxsize=512)
 def _is_sensitive_key(key: str) -> bool:
     """Check if a setting key should be encrypted.
 
@@ -127,7 +235,431 @@ def _is_sensitive_key(key: str) -> bool:
     Returns:
         bool: True if key should be encrypted.
     """
-    return any(sensitive in key.lower() for sensitive in SENSITIVE_KEYS)
+    return _SENSITIVE_RE.search(key) is not None
+
+
+
+# Cached (epoch second, "YYYY-MM-DDTHH:MM:SS") pair, swapped as one tuple so
+# threads never see a prefix from a different second.
+_utc_prefix: tuple[int, str] = (-1, "")
+
+
+def utcnow_iso() -> str:
+    """Get the current UTC time as an ISO-8601 timestamp.
+
+    Same format as datetime.now(timezone.utc).isoformat(), but always with
+    microseconds (so values sort correctly as text) and with the date part
+    formatted at most once per second.
+
+    Returns:
+        str: Timestamp such as "2024-01-01T12:00:00.000123+00:00".
+    """
+    global _utc_prefix
+    seconds, micros = divmod(time.time_ns() // 1000, 1_000_000)
+    cached_second, prefix = _utc_prefix
+    if seconds != cached_second:
+        prefix = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(seconds))
+        _utc_prefix = (seconds, prefix)
+    return f"{prefix}.{micros:06d}+00:00"
+
+
+# Connection management
+# Applied once when the shared connection opens. WAL lets readers (including the
+# separate connections used by services) proceed during writes, and with
+# synchronous=NORMAL a commit no longer fsyncs - most of the gain relies on the
+# connection (and its page cache / mmap) being reused rather than reopened.
+_PAGE_SIZE = 8192
+
+_CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-65536",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA busy_timeout=5000",
+)
+
+_db: aiosqlite.Connection | None = None
+_connect_lock = asyncio.Lock()
+# SQLite's historical (pre-3.32) default limit on ? parameters per statement
+_MAX_HOST_PARAMETERS = 999
+
+# aiosqlite serializes statements on one thread, but a shared connection also shares
+# its transaction - hold this lock across any execute(...) + commit() sequence.
+_write_lock = asyncio.Lock()
+
+
+async def get_db() -> aiosqlite.Connection:
+    """Get the shared database connection, opening it on first use.
+
+    Reusing one connection keeps SQLite's page cache warm and avoids spawning a
+    worker thread per query.
+
+    Returns:
+        aiosqlite.Connection: The shared connection.
+    """
+    global _db
+    if _db is not None:
+        return _db
+
+    async with _connect_lock:
+        if _db is None:
+            DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+            is_new = not DB_PATH.exists()
+            # sqlite3 keeps compiled statements per connection keyed by SQL text, so
+            # the constant queries below are only prepared once; size the cache so
+            # every helper's statements stay resident.
+            connection = aiosqlite.connect(DB_PATH, cached_statements=256)
+            # Don't block interpreter exit if close_db() never runs (CLI, tests)
+            connection.daemon = True
+            db = await connection
+            db.row_factory = aiosqlite.Row
+            if is_new:
+                # page_size only takes effect before the first table is written and
+                # is fixed once WAL is on, so set it while the file is still empty
+                await db.execute(f"PRAGMA page_size={_PAGE_SIZE}")
+            for pragma in _CONNECTION_PRAGMAS:
+                await db.execute(pragma)
+            _db = db
+    return _db
+
+
+async def close_db() -> None:
+    """Close the shared database connection if it is open.
+
+    Runs PRAGMA optimize first so statistics gathered during this session are
+    saved for the next one.
+    """
+    global _db
+    if _db is not None:
+        db, _db = _db, None
+        async with _write_lock:
+            await db.execute("PRAGMA optimize")
+        await db.close()
+
+
+def clear_caches() -> None:
+    """Drop every in-process cache of database reads.
+
+    Needed when the database is changed behind this module's back, e.g. by
+    another process or by tests writing through the raw connection.
+    """
+    _invalidate_rules_cache()
+    _invalidate_command_permissions()
+    global _settings_version
+    _settings_version += 1
+    _settings_cache.clear()
+
+
+async def optimize_db(check_all_tables: bool = False) -> None:
+    """Refresh query planner statistics that SQLite considers stale.
+
+    Args:
+        check_all_tables: Examine every table rather than only those queried on
+            this connection (mask 0x10002). Use once right after startup, when
+            the connection has not run any queries yet.
+    """
+    db = await get_db()
+    pragma = "PRAGMA optimize=0x10002" if check_all_tables else "PRAGMA optimize"
+    async with _write_lock:
+        await db.execute(pragma)
+
+
+async def _fetch_records(
+    query: str, params: tuple[Any, ...], fields: tuple[str, ...]
+) -> list[dict[str, Any]]:
+    """Run a SELECT and build dicts straight from plain tuple rows.
+
+    execute_fetchall() runs the query and fetches every row in a single hop to
+    the aiosqlite worker thread.
+
+    Args:
+        query: SELECT whose columns are exactly `fields`, in order.
+        params: Query parameters.
+        fields: Column names used as dict keys.
+
+    Returns:
+        list: One dictionary per row.
+    """
+    db = await get_db()
+    rows = await db.execute_fetchall(query, params)
+    return [dict(zip(fields, row)) for row in rows]
+
+
+async def _insert_returning_ids(
+    db: aiosqlite.Connection,
+    table: str,
+    columns: tuple[str, ...],
+    rows: list[tuple[Any, ...]],
+) -> list[int]:
+    """Insert rows with multi-row INSERT ... RETURNING id statements.
+
+    The caller must hold _write_lock and commit afterwards.
+
+    Args:
+        db: Shared database connection.
+        table: Table to insert into.
+        columns: Column names, matching each row's values.
+        rows: Rows to insert, in order.
+
+    Returns:
+        list: The new row ids, in the same order as rows.
+    """
+    batch_size = _MAX_HOST_PARAMETERS // len(columns)
+    row_placeholders = "(" + ", ".join("?" * len(columns)) + ")"
+    ids: list[int] = []
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start : start + batch_size]
+        rows_returned = await db.execute_fetchall(
+            f"INSERT INTO {table} ({', '.join(columns)}) "
+            f"VALUES {', '.join([row_placeholders] * len(batch))} RETURNING id",
+            [value for row in batch for value in row],
+        )
+        ids.extend(row[0] for row in rows_returned)
+    # RETURNING order is unspecified, but AUTOINCREMENT ids follow insertion order
+    ids.sort()
+    return ids
+
+
+async def _execute_delete(query: str, params: tuple[Any, ...]) -> bool:
+    """Run a DELETE and commit only if it removed something.
+
+    Deletes of rows that are already gone (e.g. a double-fired UI action) are
+    rolled back instead, so they don't append a WAL frame.
+
+    Args:
+        query: DELETE statement.
+        params: Query parameters.
+
+    Returns:
+        bool: True if any row was deleted.
+    """
+    db = await get_db()
+    async with _write_lock:
+        cursor = await db.execute(query, params)
+        if cursor.rowcount == 0:
+            # End the implicit transaction without writing anything
+            await db.rollback()
+            return False
+        await db.commit()
+    return True
+
+
+# Full schema, applied idempotently by init_db() in a single executescript() call.
+_SCHEMA_SQL = """
+-- Conversations table
+CREATE TABLE IF NOT EXISTS conversations (
+    id TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    workspace_path TEXT,
+    model TEXT,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+
+-- Messages table
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    conversation_id TEXT NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    FOREIGN KEY (conversation_id) REFERENCES conversations(id)
+);
+
+-- Global rules table
+CREATE TABLE IF NOT EXISTS global_rules (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    content TEXT NOT NULL,
+    enabled INTEGER DEFAULT 1,
+    created_at TEXT NOT NULL
+);
+
+-- Project rules table
+CREATE TABLE IF NOT EXISTS project_rules (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    workspace_path TEXT NOT NULL,
+    name TEXT NOT NULL,
+    content TEXT NOT NULL,
+    enabled INTEGER DEFAULT 1,
+    created_at TEXT NOT NULL
+);
+
+-- Settings table (for API keys, preferences, etc.)
+CREATE TABLE IF NOT EXISTS settings (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+
+-- Memories table (memory bank for persistent knowledge)
+CREATE TABLE IF NOT EXISTS memories (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    content TEXT NOT NULL,
+    tags TEXT,
+    workspace_path TEXT,
+    source TEXT NOT NULL,
+    conversation_id TEXT,
+    created_at TEXT NOT NULL,
+    last_accessed_at TEXT,
+    access_count INTEGER DEFAULT 0,
+    FOREIGN KEY (conversation_id) REFERENCES conversations(id)
+);
+
+-- MCP Servers table (for dynamic tool registration)
+CREATE TABLE IF NOT EXISTS mcp_servers (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL UNIQUE,
+    config TEXT NOT NULL,
+    enabled INTEGER DEFAULT 1,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+
+-- Command permissions table (for dynamic command approval)
+CREATE TABLE IF NOT EXISTS command_permissions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    command TEXT NOT NULL UNIQUE,
+    approved INTEGER DEFAULT 0,
+    workspace_path TEXT,
+    approved_at TEXT,
+    notes TEXT,
+    created_at TEXT NOT NULL
+);
+
+-- Checkpoints table (for undo/rollback)
+CREATE TABLE IF NOT EXISTS checkpoints (
+    id TEXT PRIMARY KEY,
+    workspace_path TEXT NOT NULL,
+    file_path TEXT NOT NULL,
+    content TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    description TEXT,
+    conversation_id TEXT,
+    FOREIGN KEY (conversation_id) REFERENCES conversations(id)
+);
+
+-- Codebase embeddings table (for semantic search)
+CREATE TABLE IF NOT EXISTS codebase_embeddings (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    workspace_path TEXT NOT NULL,
+    file_path TEXT NOT NULL,
+    chunk_start INTEGER NOT NULL,
+    chunk_end INTEGER NOT NULL,
+    content TEXT NOT NULL,
+    embedding BLOB NOT NULL,
+    updated_at TEXT NOT NULL
+);
+
+-- Task executions table (for ReAct intelligence tracking)
+CREATE TABLE IF NOT EXISTS task_executions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    conversation_id TEXT,
+    task_description TEXT NOT NULL,
+    complexity TEXT NOT NULL,
+    plan_id TEXT,
+    success INTEGER DEFAULT 0,
+    iterations_taken INTEGER DEFAULT 0,
+    errors_encountered INTEGER DEFAULT 0,
+    files_modified INTEGER DEFAULT 0,
+    execution_summary TEXT,
+    created_at TEXT NOT NULL,
+    completed_at TEXT,
+    FOREIGN KEY (conversation_id) REFERENCES conversations(id)
+);
+
+-- Error patterns table (for self-correction learning)
+CREATE TABLE IF NOT EXISTS error_patterns (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    error_type TEXT NOT NULL,
+    file_path TEXT,
+    error_message TEXT NOT NULL,
+    suggested_fix TEXT,
+    times_occurred INTEGER DEFAULT 1,
+    first_seen TEXT NOT NULL,
+    last_seen TEXT NOT NULL
+);
+
+-- Plan executions table (for tracking step completion)
+CREATE TABLE IF NOT EXISTS plan_executions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    plan_id TEXT NOT NULL,
+    task_execution_id INTEGER,
+    step_number INTEGER NOT NULL,
+    step_description TEXT NOT NULL,
+    status TEXT NOT NULL,
+    started_at TEXT,
+    completed_at TEXT,
+    FOREIGN KEY (task_execution_id) REFERENCES task_executions(id)
+);
+
+-- Create index for faster memory searches; also covers get_memories' ordering
+-- and supersedes the old single-column idx_memories_workspace
+CREATE INDEX IF NOT EXISTS idx_memories_ws_rank
+ON memories(workspace_path, access_count DESC, last_accessed_at DESC, created_at DESC);
+DROP INDEX IF EXISTS idx_memories_workspace;
+CREATE INDEX IF NOT EXISTS idx_memories_tags ON memories(tags);
+CREATE INDEX IF NOT EXISTS idx_command_permissions_command ON command_permissions(command);
+CREATE INDEX IF NOT EXISTS idx_checkpoints_workspace ON checkpoints(workspace_path);
+CREATE INDEX IF NOT EXISTS idx_codebase_embeddings_workspace ON codebase_embeddings(workspace_path);
+CREATE INDEX IF NOT EXISTS idx_codebase_embeddings_file ON codebase_embeddings(file_path);
+CREATE INDEX IF NOT EXISTS idx_task_executions_conversation ON task_executions(conversation_id);
+CREATE INDEX IF NOT EXISTS idx_error_patterns_file ON error_patterns(file_path);
+CREATE INDEX IF NOT EXISTS idx_plan_executions_task ON plan_executions(task_execution_id);
+-- Indexes for the per-request history, rules and conversation list lookups
+CREATE INDEX IF NOT EXISTS idx_messages_conv_ts ON messages(conversation_id, timestamp);
+CREATE INDEX IF NOT EXISTS idx_messages_conv_id ON messages(conversation_id, id);
+CREATE INDEX IF NOT EXISTS idx_project_rules_ws ON project_rules(workspace_path, created_at);
+CREATE INDEX IF NOT EXISTS idx_conversations_updated ON conversations(updated_at DESC);
+CREATE INDEX IF NOT EXISTS idx_project_rules_enabled
+ON project_rules(workspace_path, created_at) WHERE enabled = 1;
+
+-- Delete a conversation's messages in the same statement as the conversation.
+-- A trigger rather than ON DELETE CASCADE, which would need the messages table
+-- rebuilt and foreign_keys=ON (and that would reject deleting conversations
+-- still referenced by memories or checkpoints).
+CREATE TRIGGER IF NOT EXISTS trg_conversations_delete_messages
+AFTER DELETE ON conversations
+BEGIN
+    DELETE FROM messages WHERE conversation_id = OLD.id;
+END;
+
+-- Adding a message bumps its conversation, so writers only issue the INSERT
+CREATE TRIGGER IF NOT EXISTS trg_messages_touch_conversation
+AFTER INSERT ON messages
+BEGIN
+    UPDATE conversations SET updated_at = NEW.timestamp WHERE id = NEW.conversation_id;
+END;
+
+-- Full-text index over memories for search. The trigram tokenizer keeps the
+-- case-insensitive substring semantics of the old LIKE '%query%' scan.
+CREATE VIRTUAL TABLE IF NOT EXISTS memories_fts USING fts5(
+    content, tags, content='memories', content_rowid='id', tokenize='trigram'
+);
+CREATE TRIGGER IF NOT EXISTS trg_memories_fts_insert AFTER INSERT ON memories
+BEGIN
+    INSERT INTO memories_fts(rowid, content, tags)
+    VALUES (NEW.id, NEW.content, NEW.tags);
+END;
+CREATE TRIGGER IF NOT EXISTS trg_memories_fts_delete AFTER DELETE ON memories
+BEGIN
+    INSERT INTO memories_fts(memories_fts, rowid, content, tags)
+    VALUES ('delete', OLD.id, OLD.content, OLD.tags);
+END;
+-- Only content/tags changes touch the index, not access-count bumps
+CREATE TRIGGER IF NOT EXISTS trg_memories_fts_update
+AFTER UPDATE OF content, tags ON memories
+BEGIN
+    INSERT INTO memories_fts(memories_fts, rowid, content, tags)
+    VALUES ('delete', OLD.id, OLD.content, OLD.tags);
+    INSERT INTO memories_fts(rowid, content, tags)
+    VALUES (NEW.id, NEW.content, NEW.tags);
+END;
+"""
+
+# Bumped after each one-off migration in init_db() has run
+_SCHEMA_VERSION = 1
 
 
 async def init_db() -> None:
@@ -135,220 +667,46 @@ async def init_db() -> None:
 
     Creates the database file and all required tables if they don't exist.
     """
-    DB_PATH.parent.mkdir(parents=True, exist_ok=True)
-
-    async with aiosqlite.connect(DB_PATH) as db:
-        # Conversations table
-        await db.execute("""
-            CREATE TABLE IF NOT EXISTS conversations (
-                id TEXT PRIMARY KEY,
-                title TEXT NOT NULL,
-                workspace_path TEXT,
-                model TEXT,
-                created_at TEXT NOT NULL,
-                updated_at TEXT NOT NULL
-            )
-        """)
-
-        # Messages table
-        await db.execute("""
-            CREATE TABLE IF NOT EXISTS messages (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                conversation_id TEXT NOT NULL,
-                role TEXT NOT NULL,
-                content TEXT NOT NULL,
-                timestamp TEXT NOT NULL,
-                FOREIGN KEY (conversation_id) REFERENCES conversations(id)
-            )
-        """)
-
-        # Global rules table
-        await db.execute("""
-            CREATE TABLE IF NOT EXISTS global_rules (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                content TEXT NOT NULL,
-                enabled INTEGER DEFAULT 1,
-                created_at TEXT NOT NULL
-            )
-        """)
-
-        # Project rules table
-        await db.execute("""
-            CREATE TABLE IF NOT EXISTS project_rules (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                workspace_path TEXT NOT NULL,
-                name TEXT NOT NULL,
-                content TEXT NOT NULL,
-                enabled INTEGER DEFAULT 1,
-                created_at TEXT NOT NULL
-            )
-        """)
-
-        # Settings table (for API keys, preferences, etc.)
-        await db.execute("""
-            CREATE TABLE IF NOT EXISTS settings (
-                key TEXT PRIMARY KEY,
-                value TEXT NOT NULL,
-                updated_at TEXT NOT NULL
-            )
-        """)
-
-        # Memories table (memory bank for persistent knowledge)
-        await db.execute("""
-            CREATE TABLE IF NOT EXISTS memories (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                content TEXT NOT NULL,
-                tags TEXT,
-                workspace_path TEXT,
-                source TEXT NOT NULL,
-                conversation_id TEXT,
-                created_at TEXT NOT NULL,
-                last_accessed_at TEXT,
-                access_count INTEGER DEFAULT 0,
-                FOREIGN KEY (conversation_id) REFERENCES conversations(id)
-            )
-        """)
-
-        # MCP Servers table (for dynamic tool registration)
-        await db.execute("""
-            CREATE TABLE IF NOT EXISTS mcp_servers (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL UNIQUE,
-                config TEXT NOT NULL,
-                enabled INTEGER DEFAULT 1,
-                created_at TEXT NOT NULL,
-                updated_at TEXT NOT NULL
-            )
-        """)
-
-        # Command permissions table (for dynamic command approval)
-        await db.execute("""
-            CREATE TABLE IF NOT EXISTS command_permissions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                command TEXT NOT NULL UNIQUE,
-                approved INTEGER DEFAULT 0,
-                workspace_path TEXT,
-                approved_at TEXT,
-                notes TEXT,
-                created_at TEXT NOT NULL
-            )
-        """)
-
-        # Checkpoints table (for undo/rollback)
-        await db.execute("""
-            CREATE TABLE IF NOT EXISTS checkpoints (
-                id TEXT PRIMARY KEY,
-                workspace_path TEXT NOT NULL,
-                file_path TEXT NOT NULL,
-                content TEXT NOT NULL,
-                created_at TEXT NOT NULL,
-                description TEXT,
-                conversation_id TEXT,
-                FOREIGN KEY (conversation_id) REFERENCES conversations(id)
-            )
-        """)
-
-        # Codebase embeddings table (for semantic search)
-        await db.execute("""
-            CREATE TABLE IF NOT EXISTS codebase_embeddings (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                workspace_path TEXT NOT NULL,
-                file_path TEXT NOT NULL,
-                chunk_start INTEGER NOT NULL,
-                chunk_end INTEGER NOT NULL,
-                content TEXT NOT NULL,
-                embedding BLOB NOT NULL,
-                updated_at TEXT NOT NULL
-            )
-        """)
-
-        # Task executions table (for ReAct intelligence tracking)
-        await db.execute("""
-            CREATE TABLE IF NOT EXISTS task_executions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                conversation_id TEXT,
-                task_description TEXT NOT NULL,
-                complexity TEXT NOT NULL,
-                plan_id TEXT,
-                success INTEGER DEFAULT 0,
-                iterations_taken INTEGER DEFAULT 0,
-                errors_encountered INTEGER DEFAULT 0,
-                files_modified INTEGER DEFAULT 0,
-                execution_summary TEXT,
-                created_at TEXT NOT NULL,
-                completed_at TEXT,
-                FOREIGN KEY (conversation_id) REFERENCES conversations(id)
-            )
-        """)
-
-        # Error patterns table (for self-correction learning)
-        await db.execute("""
-            CREATE TABLE IF NOT EXISTS error_patterns (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                error_type TEXT NOT NULL,
-                file_path TEXT,
-                error_message TEXT NOT NULL,
-                suggested_fix TEXT,
-                times_occurred INTEGER DEFAULT 1,
-                first_seen TEXT NOT NULL,
-                last_seen TEXT NOT NULL
-            )
-        """)
-
-        # Plan executions table (for tracking step completion)
-        await db.execute("""
-            CREATE TABLE IF NOT EXISTS plan_executions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                plan_id TEXT NOT NULL,
-                task_execution_id INTEGER,
-                step_number INTEGER NOT NULL,
-                step_description TEXT NOT NULL,
-                status TEXT NOT NULL,
-                started_at TEXT,
-                completed_at TEXT,
-                FOREIGN KEY (task_execution_id) REFERENCES task_executions(id)
-            )
-        """)
-
-        # Create index for faster memory searches
-        await db.execute("""
-            CREATE INDEX IF NOT EXISTS idx_memories_workspace ON memories(workspace_path)
-        """)
-        await db.execute("""
-            CREATE INDEX IF NOT EXISTS idx_memories_tags ON memories(tags)
-        """)
-        await db.execute("""
-            CREATE INDEX IF NOT EXISTS idx_command_permissions_command ON command_permissions(command)
-        """)
-        await db.execute("""
-            CREATE INDEX IF NOT EXISTS idx_checkpoints_workspace ON checkpoints(workspace_path)
-        """)
-        await db.execute("""
-            CREATE INDEX IF NOT EXISTS idx_codebase_embeddings_workspace ON codebase_embeddings(workspace_path)
-        """)
-        await db.execute("""
-            CREATE INDEX IF NOT EXISTS idx_codebase_embeddings_file ON codebase_embeddings(file_path)
-        """)
-        await db.execute("""
-            CREATE INDEX IF NOT EXISTS idx_task_executions_conversation ON task_executions(conversation_id)
-        """)
-        await db.execute("""
-            CREATE INDEX IF NOT EXISTS idx_error_patterns_file ON error_patterns(file_path)
-        """)
-        await db.execute("""
-            CREATE INDEX IF NOT EXISTS idx_plan_executions_task ON plan_executions(task_execution_id)
-        """)
+    # Remove the plaintext key an earlier version cached next to the database
+    try:
+        _LEGACY_KEY_CACHE_PATH.unlink(missing_ok=True)
+    except OSError as e:
+        logger.warning("Could not remove cached encryption key", error=str(e))
+
+    db = await get_db()
+    async with _write_lock:
+        async with db.execute(
+            "SELECT name FROM sqlite_master "
+            "WHERE type = 'table' AND name IN ('memories_fts', 'sqlite_stat1')"
+        ) as cursor:
+            existing = {row[0] for row in await cursor.fetchall()}
 
+        await db.executescript(_SCHEMA_SQL)
+
+        if "memories_fts" not in existing:
+            # Index memories stored before the FTS table existed
+            await db.execute("INSERT INTO memories_fts(memories_fts) VALUES ('rebuild')")
+        if "sqlite_stat1" not in existing:
+            # Collect query planner statistics once, when the database has none yet
+            await db.execute("ANALYZE")
         await db.commit()
 
         # Run migrations
-        await _migrate_add_thinking_columns(db)
+        async with db.execute("PRAGMA user_version") as cursor:
+            (user_version,) = await cursor.fetchone()
+        if user_version < 1:
+            await _migrate_add_thinking_columns(db)
+        if user_version < _SCHEMA_VERSION:
+            await db.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+        await _migrate_tag_encrypted_settings(db)
 
 
 async def _migrate_add_thinking_columns(db: aiosqlite.Connection) -> None:
     """Add thinking_summary and thinking_content columns to messages table if they don't exist.
 
+    Runs once per database (user_version 0); databases set up before user_version
+    was tracked may already have the columns, so they are still checked.
+
     Note: SQLite ALTER TABLE ADD COLUMN is a fast metadata-only operation that doesn't
     rewrite the table, so lock time is minimal even for large tables.
     """
@@ -364,7 +722,46 @@ async def _migrate_add_thinking_columns(db: aiosqlite.Connection) -> None:
         await db.execute("ALTER TABLE messages ADD COLUMN thinking_content TEXT")
 
 
+async def _migrate_tag_encrypted_settings(db: aiosqlite.Connection) -> None:
+    """Re-encrypt untagged sensitive settings with the enc1: format.
+
+    Legacy Fernet and AES-GCM values are decrypted and re-encrypted; plaintext
+    values left over from before encryption are encrypted. Runs once per row,
+    since tagged rows are skipped.
+    """
+    async with db.execute(
+        "SELECT key, value FROM settings WHERE value NOT LIKE 'enc1:%'"
+    ) as cursor:
+        rows = await cursor.fetchall()
+
+    updates = []
+    undecryptable = []
+    for row in rows:
+        if not _is_sensitive_key(row["key"]):
+            continue
+        value = row["value"].encode()
+        plaintext = _decrypt_legacy_value(value)
+        if plaintext is None:
+            if _is_legacy_token(value):
+                # Left untagged; _decrypt_value refuses it rather than serving ciphertext
+                undecryptable.append(row["key"])
+                continue
+            plaintext = value
+        updates.append((_encrypt_value(plaintext).decode("ascii"), row["key"]))
+
+    if undecryptable:
+        logger.warning(
+            "Could not decrypt legacy settings - key may have changed", keys=undecryptable
+        )
+    if updates:
+        await db.executemany("UPDATE settings SET value = ? WHERE key = ?", updates)
+        await db.commit()
+
+
 # Conversation functions
+_CONVERSATION_FIELDS = ("id", "title", "workspace_path", "model", "created_at", "updated_at")
+
+
 async def create_conversation(
     conv_id: str,
     title: str,
@@ -382,8 +779,9 @@ async def create_conversation(
     Returns:
         dict: The created conversation.
     """
-    now = datetime.now(timezone.utc).isoformat()
-    async with aiosqlite.connect(DB_PATH) as db:
+    now = utcnow_iso()
+    db = await get_db()
+    async with _write_lock:
         await db.execute(
             """
             INSERT INTO conversations (id, title, workspace_path, model, created_at, updated_at)
@@ -412,14 +810,12 @@ async def get_conversations(limit: int = 50) -> list[dict[str, Any]]:
     Returns:
         list: List of conversation dictionaries.
     """
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
-        async with db.execute(
-            "SELECT * FROM conversations ORDER BY updated_at DESC LIMIT ?",
-            (limit,),
-        ) as cursor:
-            rows = await cursor.fetchall()
-            return [dict(row) for row in rows]
+    return await _fetch_records(
+        f"SELECT {', '.join(_CONVERSATION_FIELDS)} FROM conversations "
+        "ORDER BY updated_at DESC LIMIT ?",
+        (limit,),
+        _CONVERSATION_FIELDS,
+    )
 
 
 async def get_conversation(conv_id: str) -> dict[str, Any] | None:
@@ -431,14 +827,12 @@ async def get_conversation(conv_id: str) -> dict[str, Any] | None:
     Returns:
         dict or None: The conversation if found.
     """
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
-        async with db.execute(
-            "SELECT * FROM conversations WHERE id = ?",
-            (conv_id,),
-        ) as cursor:
-            row = await cursor.fetchone()
-            return dict(row) if row else None
+    rows = await _fetch_records(
+        f"SELECT {', '.join(_CONVERSATION_FIELDS)} FROM conversations WHERE id = ?",
+        (conv_id,),
+        _CONVERSATION_FIELDS,
+    )
+    return rows[0] if rows else None
 
 
 async def delete_conversation(conv_id: str) -> bool:
@@ -448,16 +842,26 @@ async def delete_conversation(conv_id: str) -> bool:
         conv_id: Conversation ID.
 
     Returns:
-        bool: True if deleted.
+        bool: True if deleted, False if the conversation did not exist.
     """
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute("DELETE FROM messages WHERE conversation_id = ?", (conv_id,))
-        await db.execute("DELETE FROM conversations WHERE id = ?", (conv_id,))
-        await db.commit()
-    return True
+    # trg_conversations_delete_messages removes the messages
+    return await _execute_delete("DELETE FROM conversations WHERE id = ?", (conv_id,))
 
 
 # Message functions
+_MESSAGE_FIELDS = (
+    "id",
+    "conversation_id",
+    "role",
+    "content",
+    "timestamp",
+    "thinking_summary",
+    "thinking_content",
+)
+# Messages without the (possibly large) thinking columns
+_MESSAGE_FIELDS_NO_THINKING = _MESSAGE_FIELDS[:5]
+
+
 async def add_message(
     conversation_id: str,
     role: str,
@@ -477,67 +881,256 @@ async def add_message(
     Returns:
         dict: The created message.
     """
-    now = datetime.now(timezone.utc).isoformat()
-    async with aiosqlite.connect(DB_PATH) as db:
-        cursor = await db.execute(
-            """
-            INSERT INTO messages (conversation_id, role, content, thinking_summary, thinking_content, timestamp)
-            VALUES (?, ?, ?, ?, ?, ?)
-            """,
-            (conversation_id, role, content, thinking_summary, thinking_content, now),
-        )
-        msg_id = cursor.lastrowid
-        # Update conversation timestamp
-        await db.execute(
-            "UPDATE conversations SET updated_at = ? WHERE id = ?",
-            (now, conversation_id),
+    (message,) = await add_messages_bulk(
+        conversation_id, [(role, content, thinking_summary, thinking_content)]
+    )
+    return message
+
+
+async def add_messages_bulk(
+    conversation_id: str,
+    messages: list[tuple[str, str, str | None, str | None]],
+) -> list[dict[str, Any]]:
+    """Add several messages to a conversation in a single transaction.
+
+    All rows are inserted with multi-row INSERT ... RETURNING statements and the
+    conversation timestamp is bumped by a trigger, so a whole turn costs one
+    commit instead of one per message.
+
+    Args:
+        conversation_id: Conversation ID.
+        messages: (role, content, thinking_summary, thinking_content) tuples, in order.
+
+    Returns:
+        list: The created messages.
+    """
+    if not messages:
+        return []
+
+    now = utcnow_iso()
+    db = await get_db()
+    async with _write_lock:
+        ids = await _insert_returning_ids(
+            db,
+            "messages",
+            (
+                "conversation_id",
+                "role",
+                "content",
+                "thinking_summary",
+                "thinking_content",
+                "timestamp",
+            ),
+            [(conversation_id, *message, now) for message in messages],
         )
+        # trg_messages_touch_conversation bumps conversations.updated_at
         await db.commit()
 
-    return {
-        "id": msg_id,
-        "conversation_id": conversation_id,
-        "role": role,
-        "content": content,
-        "thinking_summary": thinking_summary,
-        "thinking_content": thinking_content,
-        "timestamp": now,
-    }
+    return [
+        {
+            "id": message_id,
+            "conversation_id": conversation_id,
+            "role": role,
+            "content": content,
+            "thinking_summary": thinking_summary,
+            "thinking_content": thinking_content,
+            "timestamp": now,
+        }
+        for message_id, (role, content, thinking_summary, thinking_content) in zip(ids, messages)
+    ]
+
+
+async def get_messages(
+    conversation_id: str, include_thinking: bool = True
+) -> list[dict[str, Any]]:
+    """Get all messages for a conversation.
 
+    Args:
+        conversation_id: Conversation ID.
+        include_thinking: Whether to load thinking_summary and thinking_content.
 
-async def get_messages(conversation_id: str) -> list[dict[str, Any]]:
-    """Get all messages for a conversation.
+    Returns:
+        list: List of message dictionaries.
+    """
+    fields = _MESSAGE_FIELDS if include_thinking else _MESSAGE_FIELDS_NO_THINKING
+    return await _fetch_records(
+        f"SELECT {', '.join(fields)} FROM messages "
+        "WHERE conversation_id = ? ORDER BY timestamp, id",
+        (conversation_id,),
+        fields,
+    )
+
+
+async def _iter_message_rows(
+    conversation_id: str, columns: str, batch_size: int
+) -> AsyncIterator[list[aiosqlite.Row]]:
+    """Page through a conversation's messages by (timestamp, id), oldest first.
+
+    Each batch is its own short query that resumes after the last row of the
+    previous one, so no cursor stays open on the shared connection between
+    batches and no OFFSET rescans earlier rows.
 
     Args:
         conversation_id: Conversation ID.
+        columns: Select list; must include timestamp and id.
+        batch_size: Number of messages fetched per batch.
+
+    Yields:
+        list: Up to batch_size rows.
+    """
+    db = await get_db()
+    query = (
+        f"SELECT {columns} FROM messages "
+        "WHERE conversation_id = ? AND (timestamp, id) > (?, ?) "
+        "ORDER BY timestamp, id LIMIT ?"
+    )
+    last_timestamp, last_id = "", 0
+    while True:
+        rows = await db.execute_fetchall(
+            query, (conversation_id, last_timestamp, last_id, batch_size)
+        )
+        if not rows:
+            return
+        yield rows
+        if len(rows) < batch_size:
+            return
+        last_timestamp, last_id = rows[-1]["timestamp"], rows[-1]["id"]
+
+
+async def iter_messages(
+    conversation_id: str,
+    include_thinking: bool = True,
+    batch_size: int = 256,
+) -> AsyncIterator[list[dict[str, Any]]]:
+    """Stream a conversation's messages in batches, oldest first.
+
+    Unlike get_messages(), only one batch is held in memory at a time, so long
+    histories can be written out incrementally.
+
+    Args:
+        conversation_id: Conversation ID.
+        include_thinking: Whether to load thinking_summary and thinking_content.
+        batch_size: Number of messages fetched per batch.
+
+    Yields:
+        list: Up to batch_size message dictionaries.
+    """
+    fields = _MESSAGE_FIELDS if include_thinking else _MESSAGE_FIELDS_NO_THINKING
+    async for rows in _iter_message_rows(conversation_id, ", ".join(fields), batch_size):
+        yield [dict(row) for row in rows]
+
+
+async def iter_messages_json(
+    conversation_id: str,
+    include_thinking: bool = True,
+    batch_size: int = 256,
+) -> AsyncIterator[bytes]:
+    """Stream a conversation's messages as JSON, oldest first.
+
+    SQLite's json_object() renders each message, so no per-row tuple or dict
+    is built in Python. Each batch is the comma-joined JSON objects, ready to
+    be written into a JSON array, and only one batch is held in memory at a time.
+
+    Args:
+        conversation_id: Conversation ID.
+        include_thinking: Whether to include thinking_summary and thinking_content.
+        batch_size: Number of messages fetched per batch.
+
+    Yields:
+        bytes: Up to batch_size JSON-encoded messages, separated by commas.
+    """
+    fields = _MESSAGE_FIELDS if include_thinking else _MESSAGE_FIELDS_NO_THINKING
+    json_args = ", ".join(f"'{field}', {field}" for field in fields)
+    columns = f"timestamp, id, json_object({json_args}) AS message"
+    async for rows in _iter_message_rows(conversation_id, columns, batch_size):
+        yield ",".join([row["message"] for row in rows]).encode()
+
+
+async def get_messages_page(
+    conversation_id: str,
+    after_id: int = 0,
+    limit: int = 100,
+    include_thinking: bool = True,
+) -> list[dict[str, Any]]:
+    """Get a page of messages for a conversation, oldest first.
+
+    Pages by message id so each page is an index range scan rather than an
+    OFFSET over the whole history.
+
+    Args:
+        conversation_id: Conversation ID.
+        after_id: Only return messages with an id greater than this.
+        limit: Maximum number of messages to return.
+        include_thinking: Whether to load thinking_summary and thinking_content.
 
     Returns:
         list: List of message dictionaries.
     """
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
-        async with db.execute(
-            "SELECT * FROM messages WHERE conversation_id = ? ORDER BY timestamp",
-            (conversation_id,),
-        ) as cursor:
-            rows = await cursor.fetchall()
-            return [dict(row) for row in rows]
+    fields = _MESSAGE_FIELDS if include_thinking else _MESSAGE_FIELDS_NO_THINKING
+    return await _fetch_records(
+        f"SELECT {', '.join(fields)} FROM messages "
+        "WHERE conversation_id = ? AND id > ? ORDER BY id LIMIT ?",
+        (conversation_id, after_id, limit),
+        fields,
+    )
+
+
+async def get_last_messages(
+    conversation_id: str, count: int, include_thinking: bool = True
+) -> list[dict[str, Any]]:
+    """Get the most recent messages of a conversation, oldest first.
+
+    Args:
+        conversation_id: Conversation ID.
+        count: Number of messages to return.
+        include_thinking: Whether to load thinking_summary and thinking_content.
+
+    Returns:
+        list: List of message dictionaries.
+    """
+    fields = _MESSAGE_FIELDS if include_thinking else _MESSAGE_FIELDS_NO_THINKING
+    messages = await _fetch_records(
+        f"SELECT {', '.join(fields)} FROM messages "
+        "WHERE conversation_id = ? ORDER BY id DESC LIMIT ?",
+        (conversation_id, count),
+        fields,
+    )
+    messages.reverse()
+    return messages
 
 
 # Rules functions
+# get_enabled_rules_text() runs on every chat turn while rules change rarely, so
+# its output is cached per workspace. Every rule write bumps _rules_version, which
+# invalidates all cached entries at once.
+_rules_version = 0
+_rules_cache: dict[str, tuple[int, str]] = {}
+_rules_lock = asyncio.Lock()
+
+_GLOBAL_RULE_FIELDS = ("id", "name", "content", "enabled", "created_at")
+_PROJECT_RULE_FIELDS = ("id", "workspace_path", "name", "content", "enabled", "created_at")
+
+
+def _invalidate_rules_cache() -> None:
+    """Mark every cached rules text as stale and drop the old entries."""
+    global _rules_version
+    _rules_version += 1
+    # Entries are only ever rebuilt for workspaces still in use; a build that
+    # started before this bump stores its old version and stays stale.
+    _rules_cache.clear()
+
+
 async def get_global_rules() -> list[dict[str, Any]]:
     """Get all global rules.
 
     Returns:
         list: List of global rule dictionaries.
     """
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
-        async with db.execute(
-            "SELECT * FROM global_rules ORDER BY created_at",
-        ) as cursor:
-            rows = await cursor.fetchall()
-            return [dict(row) for row in rows]
+    return await _fetch_records(
+        f"SELECT {', '.join(_GLOBAL_RULE_FIELDS)} FROM global_rules ORDER BY created_at",
+        (),
+        _GLOBAL_RULE_FIELDS,
+    )
 
 
 async def add_global_rule(name: str, content: str) -> dict[str, Any]:
@@ -550,21 +1143,52 @@ async def add_global_rule(name: str, content: str) -> dict[str, Any]:
     Returns:
         dict: The created rule.
     """
-    now = datetime.now(timezone.utc).isoformat()
-    async with aiosqlite.connect(DB_PATH) as db:
-        cursor = await db.execute(
+    now = utcnow_iso()
+    db = await get_db()
+    async with _write_lock:
+        (rule_id,) = await db.execute_insert(
             """
             INSERT INTO global_rules (name, content, enabled, created_at)
             VALUES (?, ?, 1, ?)
             """,
             (name, content, now),
         )
-        rule_id = cursor.lastrowid
         await db.commit()
+        _invalidate_rules_cache()
 
     return {"id": rule_id, "name": name, "content": content, "enabled": 1, "created_at": now}
 
 
+async def add_global_rules_bulk(rules: list[tuple[str, str]]) -> list[dict[str, Any]]:
+    """Add several global rules in a single transaction.
+
+    Args:
+        rules: (name, content) tuples, in order.
+
+    Returns:
+        list: The created rules.
+    """
+    if not rules:
+        return []
+
+    now = utcnow_iso()
+    db = await get_db()
+    async with _write_lock:
+        ids = await _insert_returning_ids(
+            db,
+            "global_rules",
+            ("name", "content", "enabled", "created_at"),
+            [(name, content, 1, now) for name, content in rules],
+        )
+        await db.commit()
+        _invalidate_rules_cache()
+
+    return [
+        {"id": rule_id, "name": name, "content": content, "enabled": 1, "created_at": now}
+        for rule_id, (name, content) in zip(ids, rules)
+    ]
+
+
 async def update_global_rule(rule_id: int, name: str, content: str, enabled: bool) -> bool:
     """Update a global rule.
 
@@ -577,12 +1201,14 @@ async def update_global_rule(rule_id: int, name: str, content: str, enabled: boo
     Returns:
         bool: True if updated.
     """
-    async with aiosqlite.connect(DB_PATH) as db:
+    db = await get_db()
+    async with _write_lock:
         await db.execute(
             "UPDATE global_rules SET name = ?, content = ?, enabled = ? WHERE id = ?",
             (name, content, 1 if enabled else 0, rule_id),
         )
         await db.commit()
+        _invalidate_rules_cache()
     return True
 
 
@@ -593,12 +1219,12 @@ async def delete_global_rule(rule_id: int) -> bool:
         rule_id: Rule ID.
 
     Returns:
-        bool: True if deleted.
+        bool: True if deleted, False if the rule did not exist.
     """
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute("DELETE FROM global_rules WHERE id = ?", (rule_id,))
-        await db.commit()
-    return True
+    deleted = await _execute_delete("DELETE FROM global_rules WHERE id = ?", (rule_id,))
+    if deleted:
+        _invalidate_rules_cache()
+    return deleted
 
 
 async def get_project_rules(workspace_path: str) -> list[dict[str, Any]]:
@@ -610,14 +1236,12 @@ async def get_project_rules(workspace_path: str) -> list[dict[str, Any]]:
     Returns:
         list: List of project rule dictionaries.
     """
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
-        async with db.execute(
-            "SELECT * FROM project_rules WHERE workspace_path = ? ORDER BY created_at",
-            (workspace_path,),
-        ) as cursor:
-            rows = await cursor.fetchall()
-            return [dict(row) for row in rows]
+    return await _fetch_records(
+        f"SELECT {', '.join(_PROJECT_RULE_FIELDS)} FROM project_rules "
+        "WHERE workspace_path = ? ORDER BY created_at",
+        (workspace_path,),
+        _PROJECT_RULE_FIELDS,
+    )
 
 
 async def add_project_rule(workspace_path: str, name: str, content: str) -> dict[str, Any]:
@@ -631,17 +1255,18 @@ async def add_project_rule(workspace_path: str, name: str, content: str) -> dict
     Returns:
         dict: The created rule.
     """
-    now = datetime.now(timezone.utc).isoformat()
-    async with aiosqlite.connect(DB_PATH) as db:
-        cursor = await db.execute(
+    now = utcnow_iso()
+    db = await get_db()
+    async with _write_lock:
+        (rule_id,) = await db.execute_insert(
             """
             INSERT INTO project_rules (workspace_path, name, content, enabled, created_at)
             VALUES (?, ?, ?, 1, ?)
             """,
             (workspace_path, name, content, now),
         )
-        rule_id = cursor.lastrowid
         await db.commit()
+        _invalidate_rules_cache()
 
     return {
         "id": rule_id,
@@ -660,19 +1285,33 @@ async def delete_project_rule(rule_id: int) -> bool:
         rule_id: Rule ID.
 
     Returns:
-        bool: True if deleted.
+        bool: True if deleted, False if the rule did not exist.
     """
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute("DELETE FROM project_rules WHERE id = ?", (rule_id,))
-        await db.commit()
-    return True
+    deleted = await _execute_delete("DELETE FROM project_rules WHERE id = ?", (rule_id,))
+    if deleted:
+        _invalidate_rules_cache()
+    return deleted
 
 
 # Settings functions
+# Decrypted values by key with their expiry (time.monotonic()). Writes bump
+# _settings_version so a read that raced with a write doesn't cache the old value.
+_settings_cache: dict[str, tuple[float, str | None]] = {}
+_settings_version = 0
+
+
+def _invalidate_setting(key: str) -> None:
+    """Drop a cached setting value after it was written or deleted."""
+    global _settings_version
+    _settings_version += 1
+    _settings_cache.pop(key, None)
+
+
 async def get_setting(key: str) -> str | None:
     """Get a setting value by key.
 
-    Automatically decrypts sensitive values.
+    Automatically decrypts sensitive values. Values are cached in memory for
+    settings.setting_cache_ttl seconds.
 
     Args:
         key: Setting key.
@@ -680,18 +1319,25 @@ async def get_setting(key: str) -> str | None:
     Returns:
         str or None: Setting value if found (decrypted if sensitive).
     """
-    async with aiosqlite.connect(DB_PATH) as db:
-        async with db.execute(
-            "SELECT value FROM settings WHERE key = ?",
-            (key,),
-        ) as cursor:
-            row = await cursor.fetchone()
-            if not row:
-                return None
-            value = row[0]
-            if _is_sensitive_key(key):
-                return _decrypt_value(value)
-            return value
+    ttl = settings.setting_cache_ttl
+    cached = _settings_cache.get(key)
+    if cached is not None and cached[0] > time.monotonic():
+        return cached[1]
+
+    version = _settings_version
+    db = await get_db()
+    rows = await db.execute_fetchall("SELECT value FROM settings WHERE key = ?", (key,))
+    value = rows[0][0] if rows else None
+    if value is not None and _is_sensitive_key(key):
+        try:
+            value = _decrypt_value(value.encode()).decode()
+        except _DECRYPT_ERRORS:
+            logger.warning("Decryption failed - value is corrupt or key changed", key=key)
+            value = None
+
+    if ttl > 0 and version == _settings_version:
+        _settings_cache[key] = (time.monotonic() + ttl, value)
+    return value
 
 
 async def set_setting(key: str, value: str) -> None:
@@ -703,19 +1349,25 @@ async def set_setting(key: str, value: str) -> None:
         key: Setting key.
         value: Setting value (will be encrypted if key is sensitive).
     """
-    now = datetime.now(timezone.utc).isoformat()
+    now = utcnow_iso()
     # Encrypt sensitive values before storage
-    stored_value = _encrypt_value(value) if _is_sensitive_key(key) else value
-    async with aiosqlite.connect(DB_PATH) as db:
+    stored_value = value
+    if _is_sensitive_key(key):
+        stored_value = _encrypt_value(value.encode()).decode("ascii")
+    db = await get_db()
+    async with _write_lock:
         await db.execute(
             """
             INSERT INTO settings (key, value, updated_at)
             VALUES (?, ?, ?)
-            ON CONFLICT(key) DO UPDATE SET value = ?, updated_at = ?
+            ON CONFLICT(key) DO UPDATE SET
+                value = excluded.value,
+                updated_at = excluded.updated_at
             """,
-            (key, stored_value, now, stored_value, now),
+            (key, stored_value, now),
         )
         await db.commit()
+        _invalidate_setting(key)
 
 
 async def get_all_settings() -> dict[str, str]:
@@ -726,58 +1378,111 @@ async def get_all_settings() -> dict[str, str]:
     Returns:
         dict: All settings as key-value pairs (decrypted if sensitive).
     """
-    async with aiosqlite.connect(DB_PATH) as db:
-        async with db.execute("SELECT key, value FROM settings") as cursor:
-            rows = await cursor.fetchall()
-            result = {}
-            for key, value in rows:
-                if _is_sensitive_key(key):
-                    result[key] = _decrypt_value(value)
-                else:
-                    result[key] = value
-            return result
-
-
-async def delete_setting(key: str) -> None:
+    db = await get_db()
+    # Only enc1:-tagged values can need decrypting, so the rest are copied as-is
+    result = dict(
+        await db.execute_fetchall("SELECT key, value FROM settings WHERE value NOT LIKE 'enc1:%'")
+    )
+    encrypted_rows = await db.execute_fetchall(
+        "SELECT key, value FROM settings WHERE value LIKE 'enc1:%'"
+    )
+
+    # Legacy tokens the init migration could not decrypt stay unreadable
+    for key in [k for k, v in result.items() if _is_sensitive_key(k)]:
+        if _is_legacy_token(result[key].encode()):
+            logger.warning("Decryption failed - value is corrupt or key changed", key=key)
+            del result[key]
+
+    for key, value in encrypted_rows:
+        if not _is_sensitive_key(key):
+            result[key] = value
+            continue
+        try:
+            result[key] = _decrypt_value(value.encode()).decode()
+        except _DECRYPT_ERRORS:
+            logger.warning("Decryption failed - value is corrupt or key changed", key=key)
+    return result
+
+
+async def delete_setting(key: str) -> bool:
     """Delete a setting.
 
     Args:
         key: Setting key.
+
+    Returns:
+        bool: True if deleted, False if the setting did not exist.
     """
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute("DELETE FROM settings WHERE key = ?", (key,))
-        await db.commit()
+    deleted = await _execute_delete("DELETE FROM settings WHERE key = ?", (key,))
+    if deleted:
+        _invalidate_setting(key)
+    return deleted
 
 
 async def get_enabled_rules_text(workspace_path: str) -> str:
     """Get combined text of all enabled rules for a workspace.
 
+    The result is cached per workspace until the next rule write.
+
     Args:
         workspace_path: Workspace path.
 
     Returns:
         str: Combined rules text for injection into system prompt.
     """
-    rules_text = []
+    cached = _rules_cache.get(workspace_path)
+    if cached is not None and cached[0] == _rules_version:
+        return cached[1]
+
+    async with _rules_lock:
+        # Another request may have rebuilt the entry while we waited
+        cached = _rules_cache.get(workspace_path)
+        if cached is not None and cached[0] == _rules_version:
+            return cached[1]
+
+        # Capture the version before querying so a concurrent write leaves this entry stale
+        version = _rules_version
+        # Global rules, then this workspace's project rules, each oldest first
+        db = await get_db()
+        rows = await db.execute_fetchall(
+            """
+            SELECT 'Global' AS kind, name, content, created_at
+            FROM global_rules WHERE enabled = 1
+            UNION ALL
+            SELECT 'Project', name, content, created_at
+            FROM project_rules WHERE workspace_path = ? AND enabled = 1
+            ORDER BY kind, created_at
+            """,
+            (workspace_path,),
+        )
+        rules_text = [f"[{kind} Rule: {name}]\n{content}" for kind, name, content, _ in rows]
 
-    # Get global rules
-    global_rules = await get_global_rules()
-    for rule in global_rules:
-        if rule.get("enabled"):
-            rules_text.append(f"[Global Rule: {rule['name']}]\n{rule['content']}")
+        text = ""
+        if rules_text:
+            text = "\n\nUSER-DEFINED RULES (Follow these strictly):\n" + "\n\n".join(rules_text)
+        _rules_cache[workspace_path] = (version, text)
+        return text
 
-    # Get project rules
-    project_rules = await get_project_rules(workspace_path)
-    for rule in project_rules:
-        if rule.get("enabled"):
-            rules_text.append(f"[Project Rule: {rule['name']}]\n{rule['content']}")
 
-    if rules_text:
-        return "\n\nUSER-DEFINED RULES (Follow these strictly):\n" + "\n\n".join(rules_text)
-    return ""
+# Memory functions
+_MEMORY_FIELDS = (
+    "id",
+    "content",
+    "tags",
+    "workspace_path",
+    "source",
+    "conversation_id",
+    "created_at",
+    "last_accessed_at",
+    "access_count",
+)
+
+
+# Wildcards that must be escaped for a literal substring match
+_LIKE_SPECIAL_RE = re.compile(r"[\\%_]")
+_GLOB_SPECIAL_RE = re.compile(r"[*?\[]")
 
 
-# Memory functions
 async def add_memory(
     content: str,
     source: str,
@@ -797,16 +1502,16 @@ async def add_memory(
     Returns:
         dict: The created memory.
     """
-    now = datetime.now(timezone.utc).isoformat()
-    async with aiosqlite.connect(DB_PATH) as db:
-        cursor = await db.execute(
+    now = utcnow_iso()
+    db = await get_db()
+    async with _write_lock:
+        (memory_id,) = await db.execute_insert(
             """
             INSERT INTO memories (content, tags, workspace_path, source, conversation_id, created_at, last_accessed_at, access_count)
             VALUES (?, ?, ?, ?, ?, ?, ?, 0)
             """,
             (content, tags, workspace_path, source, conversation_id, now, now),
         )
-        memory_id = cursor.lastrowid
         await db.commit()
 
     return {
@@ -822,10 +1527,66 @@ async def add_memory(
     }
 
 
+async def add_memories_bulk(
+    memories: list[tuple[str, str, str | None, str | None, str | None]],
+) -> list[dict[str, Any]]:
+    """Add several memories to the memory bank in a single transaction.
+
+    Args:
+        memories: (content, source, workspace_path, conversation_id, tags) tuples, in order.
+
+    Returns:
+        list: The created memories.
+    """
+    if not memories:
+        return []
+
+    now = utcnow_iso()
+    db = await get_db()
+    async with _write_lock:
+        ids = await _insert_returning_ids(
+            db,
+            "memories",
+            (
+                "content",
+                "tags",
+                "workspace_path",
+                "source",
+                "conversation_id",
+                "created_at",
+                "last_accessed_at",
+                "access_count",
+            ),
+            [
+                (content, tags, workspace_path, source, conversation_id, now, now, 0)
+                for content, source, workspace_path, conversation_id, tags in memories
+            ],
+        )
+        await db.commit()
+
+    return [
+        {
+            "id": memory_id,
+            "content": content,
+            "tags": tags,
+            "workspace_path": workspace_path,
+            "source": source,
+            "conversation_id": conversation_id,
+            "created_at": now,
+            "last_accessed_at": now,
+            "access_count": 0,
+        }
+        for memory_id, (content, source, workspace_path, conversation_id, tags) in zip(
+            ids, memories
+        )
+    ]
+
+
 async def get_memories(
     workspace_path: str | None = None,
     limit: int = 50,
     search_query: str | None = None,
+    case_sensitive: bool = False,
 ) -> list[dict[str, Any]]:
     """Get memories, optionally filtered by workspace and search query.
 
@@ -833,30 +1594,38 @@ async def get_memories(
         workspace_path: Optional workspace path to filter by.
         limit: Maximum number of memories to return.
         search_query: Optional search query to filter memories.
+        case_sensitive: Match search_query exactly (GLOB) rather than ignoring case.
 
     Returns:
         list: List of memory dictionaries, sorted by relevance (access_count, last_accessed_at).
     """
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
-        query = "SELECT * FROM memories WHERE 1=1"
-        params: list[Any] = []
+    query = f"SELECT {', '.join(_MEMORY_FIELDS)} FROM memories WHERE 1=1"
+    params: list[Any] = []
+
+    if workspace_path:
+        query += " AND (workspace_path = ? OR workspace_path IS NULL)"
+        params.append(workspace_path)
 
-        if workspace_path:
-            query += " AND (workspace_path = ? OR workspace_path IS NULL)"
-            params.append(workspace_path)
+    if search_query and len(search_query) >= 3:
+        # Quoted as a single FTS phrase so the query is matched literally
+        query += " AND id IN (SELECT rowid FROM memories_fts WHERE memories_fts MATCH ?)"
+        params.append('"' + search_query.replace('"', '""') + '"')
+    elif search_query and not case_sensitive:
+        # Trigram index can't match fewer than 3 characters; fall back to a scan
+        query += " AND (content LIKE ? ESCAPE '\\' OR tags LIKE ? ESCAPE '\\')"
+        search_term = "%" + _LIKE_SPECIAL_RE.sub(r"\\\g<0>", search_query) + "%"
+        params.extend([search_term, search_term])
 
-        if search_query:
-            query += " AND (content LIKE ? OR tags LIKE ?)"
-            search_term = f"%{search_query}%"
-            params.extend([search_term, search_term])
+    if search_query and case_sensitive:
+        # GLOB compares bytes, so it also narrows the case-insensitive FTS match
+        query += " AND (content GLOB ? OR tags GLOB ?)"
+        search_term = "*" + _GLOB_SPECIAL_RE.sub(r"[\g<0>]", search_query) + "*"
+        params.extend([search_term, search_term])
 
-        query += " ORDER BY access_count DESC, last_accessed_at DESC, created_at DESC LIMIT ?"
-        params.append(limit)
+    query += " ORDER BY access_count DESC, last_accessed_at DESC, created_at DESC LIMIT ?"
+    params.append(limit)
 
-        async with db.execute(query, params) as cursor:
-            rows = await cursor.fetchall()
-            return [dict(row) for row in rows]
+    return await _fetch_records(query, tuple(params), _MEMORY_FIELDS)
 
 
 async def get_relevant_memories(
@@ -887,15 +1656,29 @@ async def update_memory_access(memory_id: int) -> None:
     Args:
         memory_id: Memory ID to update.
     """
-    now = datetime.now(timezone.utc).isoformat()
-    async with aiosqlite.connect(DB_PATH) as db:
+    await update_memories_access([memory_id])
+
+
+async def update_memories_access(memory_ids: list[int]) -> None:
+    """Update access statistics for several memories with one UPDATE and commit.
+
+    Args:
+        memory_ids: Memory IDs to update.
+    """
+    if not memory_ids:
+        return
+
+    now = utcnow_iso()
+    placeholders = ", ".join("?" * len(memory_ids))
+    db = await get_db()
+    async with _write_lock:
         await db.execute(
-            """
-            UPDATE memories 
+            f"""
+            UPDATE memories
             SET last_accessed_at = ?, access_count = access_count + 1
-            WHERE id = ?
+            WHERE id IN ({placeholders})
             """,
-            (now, memory_id),
+            (now, *memory_ids),
         )
         await db.commit()
 
@@ -907,12 +1690,9 @@ async def delete_memory(memory_id: int) -> bool:
         memory_id: Memory ID to delete.
 
     Returns:
-        bool: True if deleted.
+        bool: True if deleted, False if the memory did not exist.
     """
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute("DELETE FROM memories WHERE id = ?", (memory_id,))
-        await db.commit()
-    return True
+    return await _execute_delete("DELETE FROM memories WHERE id = ?", (memory_id,))
 
 
 async def get_memories_text(workspace_path: str | None = None, context: str | None = None) -> str:
@@ -930,8 +1710,7 @@ async def get_memories_text(workspace_path: str | None = None, context: str | No
         return ""
 
     # Update access counts for retrieved memories
-    for memory in memories:
-        await update_memory_access(memory["id"])
+    await update_memories_access([memory["id"] for memory in memories])
 
     memory_texts = []
     for memory in memories:
@@ -942,6 +1721,9 @@ async def get_memories_text(workspace_path: str | None = None, context: str | No
 
 
 # MCP Server functions
+_MCP_SERVER_COLUMNS = "id, name, config, enabled, created_at, updated_at"
+
+
 async def add_mcp_server(name: str, config: dict[str, Any]) -> dict[str, Any]:
     """Add an MCP server configuration.
 
@@ -952,18 +1734,21 @@ async def add_mcp_server(name: str, config: dict[str, Any]) -> dict[str, Any]:
     Returns:
         dict: The created server configuration.
     """
-    now = datetime.now(timezone.utc).isoformat()
-    config_json = json.dumps(config)
-    async with aiosqlite.connect(DB_PATH) as db:
-        cursor = await db.execute(
+    now = utcnow_iso()
+    config_json = orjson.dumps(config).decode()
+    db = await get_db()
+    async with _write_lock:
+        (server_id,) = await db.execute_insert(
             """
             INSERT INTO mcp_servers (name, config, enabled, created_at, updated_at)
             VALUES (?, ?, 1, ?, ?)
-            ON CONFLICT(name) DO UPDATE SET config = ?, enabled = 1, updated_at = ?
+            ON CONFLICT(name) DO UPDATE SET
+                config = excluded.config,
+                enabled = 1,
+                updated_at = excluded.updated_at
             """,
-            (name, config_json, now, now, config_json, now),
+            (name, config_json, now, now),
         )
-        server_id = cursor.lastrowid
         await db.commit()
 
     return {
@@ -982,20 +1767,20 @@ async def get_mcp_servers() -> list[dict[str, Any]]:
     Returns:
         list: List of server configurations.
     """
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
-        async with db.execute("SELECT * FROM mcp_servers ORDER BY created_at") as cursor:
-            rows = await cursor.fetchall()
-            result = []
-            for row in rows:
-                server = dict(row)
-                # Parse JSON config
-                try:
-                    server["config"] = json.loads(server["config"])
-                except Exception:
-                    server["config"] = {}
-                result.append(server)
-            return result
+    db = await get_db()
+    rows = await db.execute_fetchall(
+        f"SELECT {_MCP_SERVER_COLUMNS} FROM mcp_servers ORDER BY created_at"
+    )
+    result = []
+    for row in rows:
+        server = dict(row)
+        # Parse JSON config
+        try:
+            server["config"] = orjson.loads(server["config"])
+        except Exception:
+            server["config"] = {}
+        result.append(server)
+    return result
 
 
 async def get_mcp_server(name: str) -> dict[str, Any] | None:
@@ -1007,18 +1792,18 @@ async def get_mcp_server(name: str) -> dict[str, Any] | None:
     Returns:
         dict or None: Server configuration if found.
     """
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
-        async with db.execute("SELECT * FROM mcp_servers WHERE name = ?", (name,)) as cursor:
-            row = await cursor.fetchone()
-            if row:
-                server = dict(row)
-                try:
-                    server["config"] = json.loads(server["config"])
-                except Exception:
-                    server["config"] = {}
-                return server
-            return None
+    db = await get_db()
+    rows = await db.execute_fetchall(
+        f"SELECT {_MCP_SERVER_COLUMNS} FROM mcp_servers WHERE name = ?", (name,)
+    )
+    if rows:
+        server = dict(rows[0])
+        try:
+            server["config"] = orjson.loads(server["config"])
+        except Exception:
+            server["config"] = {}
+        return server
+    return None
 
 
 async def update_mcp_server(name: str, config: dict[str, Any], enabled: bool = True) -> bool:
@@ -1032,9 +1817,10 @@ async def update_mcp_server(name: str, config: dict[str, Any], enabled: bool = T
     Returns:
         bool: True if updated.
     """
-    now = datetime.now(timezone.utc).isoformat()
-    config_json = json.dumps(config)
-    async with aiosqlite.connect(DB_PATH) as db:
+    now = utcnow_iso()
+    config_json = orjson.dumps(config).decode()
+    db = await get_db()
+    async with _write_lock:
         await db.execute(
             """
             UPDATE mcp_servers 
@@ -1054,18 +1840,35 @@ async def delete_mcp_server(name: str) -> bool:
         name: Server name.
 
     Returns:
-        bool: True if deleted.
+        bool: True if deleted, False if the server did not exist.
     """
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute("DELETE FROM mcp_servers WHERE name = ?", (name,))
-        await db.commit()
-    return True
+    return await _execute_delete("DELETE FROM mcp_servers WHERE name = ?", (name,))
 
 
 # Command permissions functions
+# check_command_permission() runs before every tool command, so lookups are
+# cached per (command, workspace). Writes bump _permissions_version, which drops
+# every entry and keeps a lookup that raced with the write from being stored.
+_COMMAND_PERMISSION_COLUMNS = (
+    "id, command, approved, workspace_path, approved_at, notes, created_at"
+)
+_PERMISSIONS_CACHE_SIZE = 512
+_permissions_cache: dict[tuple[str, str | None], dict[str, Any] | None] = {}
+_permissions_version = 0
+
+
+def _invalidate_command_permissions() -> None:
+    """Drop every cached permission lookup after a permission write."""
+    global _permissions_version
+    _permissions_version += 1
+    _permissions_cache.clear()
+
+
 async def check_command_permission(command: str, workspace_path: str | None = None) -> dict[str, Any] | None:
     """Check if a command has been approved.
 
+    Results, including misses, are cached until the next permission write.
+
     Args:
         command: Command to check (base command, e.g., 'node', 'python').
         workspace_path: Optional workspace path for workspace-specific permissions.
@@ -1073,26 +1876,49 @@ async def check_command_permission(command: str, workspace_path: str | None = No
     Returns:
         dict or None: Permission record if found, None otherwise.
     """
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
-        
-        # Check for workspace-specific permission first, then global
-        if workspace_path:
-            async with db.execute(
-                "SELECT * FROM command_permissions WHERE command = ? AND (workspace_path = ? OR workspace_path IS NULL) ORDER BY workspace_path DESC LIMIT 1",
-                (command, workspace_path),
-            ) as cursor:
-                row = await cursor.fetchone()
-                if row:
-                    return dict(row)
-        
-        # Check global permission
-        async with db.execute(
-            "SELECT * FROM command_permissions WHERE command = ? AND workspace_path IS NULL",
+    key = (command, workspace_path)
+    if key in _permissions_cache:
+        cached = _permissions_cache[key]
+        return dict(cached) if cached is not None else None
+
+    version = _permissions_version
+    permission = await _query_command_permission(command, workspace_path)
+    if version == _permissions_version:
+        if len(_permissions_cache) >= _PERMISSIONS_CACHE_SIZE:
+            # Evict the oldest entry; dicts keep insertion order
+            del _permissions_cache[next(iter(_permissions_cache))]
+        _permissions_cache[key] = permission
+    return dict(permission) if permission is not None else None
+
+
+async def _query_command_permission(
+    command: str, workspace_path: str | None
+) -> dict[str, Any] | None:
+    """Look up the permission for a command, preferring the workspace-specific one.
+
+    Args:
+        command: Base command.
+        workspace_path: Optional workspace path.
+
+    Returns:
+        dict or None: Permission record if found.
+    """
+    db = await get_db()
+    if workspace_path:
+        # A workspace-specific row sorts before the global (NULL) one
+        rows = await db.execute_fetchall(
+            f"SELECT {_COMMAND_PERMISSION_COLUMNS} FROM command_permissions "
+            "WHERE command = ? AND (workspace_path = ? OR workspace_path IS NULL) "
+            "ORDER BY workspace_path DESC LIMIT 1",
+            (command, workspace_path),
+        )
+    else:
+        rows = await db.execute_fetchall(
+            f"SELECT {_COMMAND_PERMISSION_COLUMNS} FROM command_permissions "
+            "WHERE command = ? AND workspace_path IS NULL LIMIT 1",
             (command,),
-        ) as cursor:
-            row = await cursor.fetchone()
-            return dict(row) if row else None
+        )
+    return dict(rows[0]) if rows else None
 
 
 async def add_command_permission(
@@ -1112,23 +1938,23 @@ async def add_command_permission(
     Returns:
         dict: The created/updated permission.
     """
-    now = datetime.now(timezone.utc).isoformat()
-    async with aiosqlite.connect(DB_PATH) as db:
-        cursor = await db.execute(
+    now = utcnow_iso()
+    db = await get_db()
+    async with _write_lock:
+        (perm_id,) = await db.execute_insert(
             """
             INSERT INTO command_permissions (command, approved, workspace_path, approved_at, notes, created_at)
             VALUES (?, ?, ?, ?, ?, ?)
             ON CONFLICT(command) DO UPDATE SET
-                approved = ?,
-                workspace_path = ?,
-                approved_at = ?,
-                notes = ?
+                approved = excluded.approved,
+                workspace_path = excluded.workspace_path,
+                approved_at = excluded.approved_at,
+                notes = excluded.notes
             """,
-            (command, 1 if approved else 0, workspace_path, now if approved else None, notes, now,
-             1 if approved else 0, workspace_path, now if approved else None, notes),
+            (command, 1 if approved else 0, workspace_path, now if approved else None, notes, now),
         )
-        perm_id = cursor.lastrowid
         await db.commit()
+        _invalidate_command_permissions()
 
     return {
         "id": perm_id,
@@ -1150,19 +1976,23 @@ async def get_all_command_permissions(workspace_path: str | None = None) -> list
     Returns:
         list: List of permission dictionaries.
     """
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
-        
-        if workspace_path:
-            query = "SELECT * FROM command_permissions WHERE workspace_path = ? OR workspace_path IS NULL ORDER BY created_at DESC"
-            params = (workspace_path,)
-        else:
-            query = "SELECT * FROM command_permissions ORDER BY created_at DESC"
-            params = ()
-        
-        async with db.execute(query, params) as cursor:
-            rows = await cursor.fetchall()
-            return [dict(row) for row in rows]
+    db = await get_db()
+    
+    if workspace_path:
+        query = (
+            f"SELECT {_COMMAND_PERMISSION_COLUMNS} FROM command_permissions "
+            "WHERE workspace_path = ? OR workspace_path IS NULL ORDER BY created_at DESC"
+        )
+        params = (workspace_path,)
+    else:
+        query = (
+            f"SELECT {_COMMAND_PERMISSION_COLUMNS} FROM command_permissions "
+            "ORDER BY created_at DESC"
+        )
+        params = ()
+    
+    rows = await db.execute_fetchall(query, params)
+    return [dict(row) for row in rows]
 
 
 async def delete_command_permission(command: str, workspace_path: str | None = None) -> bool:
@@ -1173,18 +2003,18 @@ async def delete_command_permission(command: str, workspace_path: str | None = N
         workspace_path: Optional workspace path.
 
     Returns:
-        bool: True if deleted.
+        bool: True if deleted, False if no matching permission existed.
     """
-    async with aiosqlite.connect(DB_PATH) as db:
-        if workspace_path:
-            await db.execute(
-                "DELETE FROM command_permissions WHERE command = ? AND workspace_path = ?",
-                (command, workspace_path),
-            )
-        else:
-            await db.execute(
-                "DELETE FROM command_permissions WHERE command = ? AND workspace_path IS NULL",
-                (command,),
-            )
-        await db.commit()
-    return True
+    if workspace_path:
+        deleted = await _execute_delete(
+            "DELETE FROM command_permissions WHERE command = ? AND workspace_path = ?",
+            (command, workspace_path),
+        )
+    else:
+        deleted = await _execute_delete(
+            "DELETE FROM command_permissions WHERE command = ? AND workspace_path IS NULL",
+            (command,),
+        )
+    if deleted:
+        _invalidate_command_permissions()
+    return deleted
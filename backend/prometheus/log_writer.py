@@ -0,0 +1,155 @@
+"""Background log writer so request handlers never block on stdout."""
+import atexit
+import queue
+import sys
+import threading
+import time
+from typing import Any
+
+import orjson
+
+# Sentinel that tells the writer thread to flush and exit
+_STOP = object()
+# Minimum seconds between two "records dropped" notices
+_DROP_REPORT_INTERVAL = 10.0
+
+
+class QueuedLogWriter:
+    """Write encoded log records to stdout from a background thread.
+
+    Records are put on a bounded queue by the event loop thread and drained by
+    a single daemon thread, so a slow or blocked stdout never stalls a request.
+    When the queue is full, new records are dropped and counted; a record that
+    stdout fails to take is counted too. The counts are written out as a warning
+    record at most every _DROP_REPORT_INTERVAL seconds and at shutdown.
+
+    Args:
+        max_size: Maximum number of records waiting to be written.
+    """
+
+    def __init__(self, max_size: int) -> None:
+        self._queue: queue.Queue[Any] = queue.Queue(max_size)
+        self.dropped = 0
+        self.write_failures = 0
+        self._reported = (0, 0)
+        self._last_report = 0.0
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def put(self, record: bytes) -> None:
+        """Queue one encoded record, dropping it if the queue is full.
+
+        Args:
+            record: Log line without the trailing newline.
+        """
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self, timeout: float = 2.0) -> None:
+        """Flush queued records and stop the writer thread.
+
+        Args:
+            timeout: Seconds to wait for the queue to drain.
+        """
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+
+    def _run(self) -> None:
+        """Drain the queue, flushing whenever it runs empty."""
+        while True:
+            record = self._queue.get()
+            if record is _STOP:
+                break
+            self._write(record)
+            if self._queue.empty():
+                self._report_drops()
+                self._flush()
+        self._report_drops(force=True)
+        self._flush()
+
+    def _write(self, record: bytes) -> None:
+        """Write one record, counting it as failed if stdout rejects it.
+
+        Args:
+            record: Log line without the trailing newline.
+        """
+        try:
+            # Look stdout up per write so redirection (e.g. by pytest) is honored
+            sys.stdout.buffer.write(record + b"\n")
+        except (OSError, ValueError):
+            # A closed or broken stdout must not kill the thread
+            self.write_failures += 1
+
+    def _flush(self) -> None:
+        """Flush stdout, ignoring a closed or broken stream."""
+        try:
+            sys.stdout.buffer.flush()
+        except (OSError, ValueError):
+            pass
+
+    def _report_drops(self, force: bool = False) -> None:
+        """Write a warning record if records were lost since the last report.
+
+        Args:
+            force: Report regardless of when the last report was written.
+        """
+        counts = (self.dropped, self.write_failures)
+        if counts == self._reported:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_report < _DROP_REPORT_INTERVAL:
+            return
+        dropped = counts[0] - self._reported[0]
+        failed = counts[1] - self._reported[1]
+        self._reported = counts
+        self._last_report = now
+        self._write(
+            orjson.dumps(
+                {
+                    "dropped": dropped,
+                    "write_failures": failed,
+                    "event": "Log records lost",
+                    "level": "warning",
+                }
+            )
+        )
+
+
+class QueuedBytesLogger:
+    """structlog logger that hands rendered records to a QueuedLogWriter.
+
+    Args:
+        writer: Writer shared by every logger.
+    """
+
+    def __init__(self, writer: QueuedLogWriter) -> None:
+        self._writer = writer
+
+    def msg(self, message: bytes) -> None:
+        """Queue a rendered record.
+
+        Args:
+            message: Record rendered by the last structlog processor.
+        """
+        self._writer.put(message)
+
+    log = debug = info = warn = warning = msg
+    fatal = failure = err = error = critical = exception = msg
+
+
+class QueuedBytesLoggerFactory:
+    """structlog logger factory producing QueuedBytesLogger instances.
+
+    Args:
+        max_size: Maximum number of records waiting to be written.
+    """
+
+    def __init__(self, max_size: int) -> None:
+        self.writer = QueuedLogWriter(max_size)
+
+    def __call__(self, *args: Any) -> QueuedBytesLogger:
+        return QueuedBytesLogger(self.writer)
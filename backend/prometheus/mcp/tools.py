@@ -1,12 +1,26 @@
+import base64
+import codecs
 import difflib
+import functools
+import io
 import os
 import re
 import shlex
+import shutil
+import signal
+import stat
 import subprocess
+import tempfile
+import threading
+import time
+import uuid
 import asyncio
+from collections import OrderedDict
+from collections.abc import Iterator
 from pathlib import Path
 from typing import Any
 
+import orjson
 from pydantic import BaseModel
 
 
@@ -36,6 +50,449 @@ class GrepRequest(BaseModel):
     context_lines: int = 0
 
 
+# Security: shell commands matching any of these are refused by shell_execute
+_DANGEROUS_COMMAND_PATTERNS = (
+    r'rm\s+-rf\s+/',  # rm -rf /
+    r'rm\s+-fr\s+/',  # rm -fr / (alternate flag order)
+    r'rm\s+-rf\s+/\*',  # rm -rf /*
+    r':\(\)\{.*\}',  # Fork bomb
+    r'dd\s+if=',  # Disk destruction
+    r'mkfs\s+',  # Format filesystem
+    r'format\s+',  # Format command
+    r'>\s*/dev/sd',  # Write to block device
+    r'wget.*\|.*sh',  # Download and pipe to shell
+    r'curl.*\|.*sh',  # Download and pipe to shell
+)
+# One alternation, so a command is scanned once instead of once per pattern
+_DANGEROUS_COMMAND_RE = re.compile(
+    "|".join(f"(?:{pattern})" for pattern in _DANGEROUS_COMMAND_PATTERNS), re.IGNORECASE
+)
+
+
+@functools.lru_cache(maxsize=512)
+def _split_command(command: str) -> tuple[str, ...]:
+    """Tokenize a command line with shlex, memoized for repeated commands.
+
+    Args:
+        command (str): Command line.
+
+    Returns:
+        tuple[str, ...]: The command's arguments.
+
+    Raises:
+        ValueError: If the command has unbalanced quotes.
+    """
+    return tuple(shlex.split(command))
+
+
+def _run_process(
+    cmd: list[str], cwd: str, timeout: float, stdin_input: str | None = None
+) -> subprocess.CompletedProcess[str]:
+    """Run a command in its own session, killing the whole session on timeout.
+
+    subprocess.run only kills the direct child when the timeout expires; any
+    processes it started keep the output pipes open and the call blocks until
+    they exit. Starting a new session lets the entire process group be killed.
+
+    Args:
+        cmd (list[str]): Command and arguments.
+        cwd (str): Working directory.
+        timeout (float): Seconds to wait before killing the process group.
+        stdin_input (str | None): Text to send on stdin.
+
+    Returns:
+        subprocess.CompletedProcess[str]: The finished process with its output.
+
+    Raises:
+        subprocess.TimeoutExpired: If the command ran longer than timeout.
+    """
+    with subprocess.Popen(
+        cmd,
+        cwd=cwd,
+        stdin=subprocess.PIPE if stdin_input is not None else subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        start_new_session=True,
+    ) as process:
+        try:
+            stdout, stderr = process.communicate(stdin_input, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            try:
+                os.killpg(process.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+            process.communicate()
+            raise
+    return subprocess.CompletedProcess(cmd, process.returncode, stdout, stderr)
+
+
+def _format_hunk_range(start: int, stop: int) -> str:
+    """Format a line range for a unified diff hunk header, as difflib does.
+
+    Args:
+        start (int): 0-based index of the first line.
+        stop (int): 0-based index past the last line.
+
+    Returns:
+        str: "start,length", or just "start" for a single line.
+    """
+    beginning = start + 1
+    length = stop - start
+    if length == 1:
+        return f"{beginning}"
+    if not length:
+        beginning -= 1
+    return f"{beginning},{length}"
+
+
+# diff(1) binary used for large diffs, or None to always use difflib
+_DIFF_PATH = shutil.which("diff")
+# Below this many lines in total, difflib finishes before a diff process starts
+_EXTERNAL_DIFF_MIN_LINES = 1000
+
+
+def _difflib_hunks(old_lines: list[str], new_lines: list[str]) -> list[dict[str, Any]]:
+    """Build diff hunks from difflib's grouped opcodes (what unified_diff formats from).
+
+    Args:
+        old_lines (list[str]): Original lines, with line endings.
+        new_lines (list[str]): New lines, with line endings.
+
+    Returns:
+        list[dict[str, Any]]: Hunks with a unified diff header and typed changes.
+    """
+    if not old_lines or not new_lines:
+        # Writing into an empty file or truncating one: the diff is a single
+        # all-added or all-removed hunk, so skip the matcher
+        if old_lines:
+            groups = [[("delete", 0, len(old_lines), 0, 0)]]
+        elif new_lines:
+            groups = [[("insert", 0, 0, 0, len(new_lines))]]
+        else:
+            groups = []
+    else:
+        # autojunk treats lines such as blanks and lone braces as junk once a file
+        # passes 200 lines, which misaligns hunks; it only pays off on large
+        # inputs, and those go to diff(1) when it is installed
+        autojunk = len(old_lines) + len(new_lines) >= _EXTERNAL_DIFF_MIN_LINES
+        matcher = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=autojunk)
+        groups = matcher.get_grouped_opcodes(3)
+
+    hunks = []
+    for group in groups:
+        _, old_start, _, new_start, _ = group[0]
+        _, _, old_end, _, new_end = group[-1]
+        changes = []
+        for tag, i1, i2, j1, j2 in group:
+            if tag == "equal":
+                changes.extend({"type": "context", "line": line} for line in old_lines[i1:i2])
+                continue
+            if tag in ("replace", "delete"):
+                changes.extend({"type": "removed", "line": line} for line in old_lines[i1:i2])
+            if tag in ("replace", "insert"):
+                changes.extend({"type": "added", "line": line} for line in new_lines[j1:j2])
+        header = (
+            f"@@ -{_format_hunk_range(old_start, old_end)} "
+            f"+{_format_hunk_range(new_start, new_end)} @@"
+        )
+        hunks.append({"header": header, "changes": changes})
+    return hunks
+
+
+_UNIFIED_CHANGE_TYPES = {" ": "context", "-": "removed", "+": "added"}
+
+
+def _external_diff_hunks(
+    old_lines: list[str], new_lines: list[str]
+) -> list[dict[str, Any]] | None:
+    """Build diff hunks by running diff -U3 and parsing its output.
+
+    SequenceMatcher degrades badly when many scattered lines change (seconds for
+    a few thousand lines); diff's Myers algorithm stays in milliseconds.
+
+    Args:
+        old_lines (list[str]): Original lines, with line endings.
+        new_lines (list[str]): New lines, with line endings.
+
+    Returns:
+        list[dict[str, Any]] | None: Hunks in the same shape as _difflib_hunks,
+        or None if diff could not be run.
+    """
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            old_path = os.path.join(tmp_dir, "old")
+            new_path = os.path.join(tmp_dir, "new")
+            for file_path, lines in ((old_path, old_lines), (new_path, new_lines)):
+                with open(
+                    file_path, "w", encoding="utf-8", errors="surrogateescape", newline=""
+                ) as f:
+                    f.writelines(lines)
+            result = subprocess.run(
+                [_DIFF_PATH, "-U3", old_path, new_path],
+                stdin=subprocess.DEVNULL,
+                capture_output=True,
+                timeout=10,
+            )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    # Exit status 1 means the inputs differ; 2 means diff failed
+    if result.returncode == 2:
+        return None
+
+    hunks = []
+    changes: list[dict[str, str]] = []
+    for line in result.stdout.decode("utf-8", errors="surrogateescape").split("\n"):
+        if line.startswith("@@"):
+            changes = []
+            hunks.append({"header": line, "changes": changes})
+        elif not hunks or not line:
+            # File headers before the first hunk and the empty string after the last newline
+            continue
+        elif line.startswith("\\"):
+            # "\ No newline at end of file" applies to the change before it
+            changes[-1]["line"] = changes[-1]["line"][:-1]
+        else:
+            changes.append({"type": _UNIFIED_CHANGE_TYPES[line[0]], "line": line[1:] + "\n"})
+    return hunks
+
+
+# Characters that make a grep pattern more than plain text (plus the newlines
+# that text-mode reads translate)
+_REGEX_SPECIAL_CHARS = frozenset(".^$*+?{}[]\\|()\r\n")
+# Byte order marks after which ripgrep transcodes a file from UTF-16
+_UTF16_BOMS = (codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)
+
+
+def _uses_class_set_syntax(pattern: str) -> bool:
+    """Check for character class syntax that ripgrep and re read differently.
+
+    Inside [...], ripgrep starts a nested class at [ (as in POSIX classes such
+    as [[:alpha:]]) and treats &&, -- and ~~ as set operations; re takes all of
+    them as literal characters.
+
+    Args:
+        pattern (str): Regular expression pattern.
+
+    Returns:
+        bool: True if the pattern has a class using any of that syntax.
+    """
+    in_class = False
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == "\\":
+            i += 2
+            continue
+        if not in_class:
+            if char == "[":
+                in_class = True
+                i += 1
+                # A ] right after [ or [^ is a literal member
+                if pattern.startswith("^", i):
+                    i += 1
+                if pattern.startswith("]", i):
+                    i += 1
+                continue
+        elif char == "]":
+            in_class = False
+        elif char == "[" or pattern[i : i + 2] in ("&&", "--", "~~"):
+            return True
+        i += 1
+    return False
+
+
+def _iter_search_files(root: str, recursive: bool) -> Iterator[os.DirEntry[str]]:
+    """Yield the regular files under a directory that grep searches.
+
+    Dot files and dot directories are skipped before descending and symlinks are
+    not followed, as ripgrep does. DirEntry types come from the directory read,
+    so no stat() is needed to tell files from directories.
+
+    Args:
+        root (str): Directory to search.
+        recursive (bool): Descend into subdirectories.
+
+    Yields:
+        os.DirEntry[str]: Each file to search.
+    """
+    stack = [root]
+    while stack:
+        try:
+            it = os.scandir(stack.pop())
+        except OSError:
+            # Unreadable directories are skipped, as rglob did
+            continue
+        with it:
+            for entry in it:
+                if entry.name.startswith("."):
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    if recursive:
+                        stack.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    yield entry
+
+
+# ripgrep binary used by MCPTools.grep, or None to search in Python
+_RG_PATH = shutil.which("rg")
+
+
+def _rg_text(data: dict[str, Any]) -> str:
+    """Decode a text field from ripgrep's JSON output.
+
+    Args:
+        data (dict[str, Any]): Field holding "text", or base64 "bytes" when not valid UTF-8.
+
+    Returns:
+        str: The decoded text.
+    """
+    if "text" in data:
+        return data["text"]
+    return base64.b64decode(data["bytes"]).decode("utf-8", errors="ignore")
+
+
+def _grep_match_entry(line_num: int, lines: dict[int, str], context_lines: int) -> dict[str, Any]:
+    """Build one grep match with its surrounding context lines.
+
+    Args:
+        line_num (int): Matching line number.
+        lines (dict[int, str]): Every line ripgrep reported for the file, by number.
+        context_lines (int): Number of context lines on each side.
+
+    Returns:
+        dict[str, Any]: The match, as MCPTools.grep reports it.
+    """
+    match_info: dict[str, Any] = {"line_number": line_num, "line": lines[line_num]}
+    if context_lines > 0:
+        # ripgrep reports every line within context_lines of any match, so a
+        # missing line number means the file ended
+        context_before = [
+            {"line_number": i, "line": lines[i]}
+            for i in range(max(1, line_num - context_lines), line_num)
+        ]
+        context_after = [
+            {"line_number": i, "line": lines[i]}
+            for i in range(line_num + 1, line_num + context_lines + 1)
+            if i in lines
+        ]
+        if context_before:
+            match_info["context_before"] = context_before
+        if context_after:
+            match_info["context_after"] = context_after
+    return match_info
+
+
+# Lines of recently read files, shared by every MCPTools instance:
+# path -> ((mtime_ns, size, inode), lines). Bounded by the total file size.
+_LINES_CACHE: OrderedDict[str, tuple[tuple[int, int, int], list[str]]] = OrderedDict()
+_LINES_CACHE_MAX_BYTES = 64 * 1024 * 1024
+_lines_cache_bytes = 0
+_lines_cache_lock = threading.Lock()
+# A file modified this recently may be modified again without its mtime changing,
+# so it is not cached until its mtime is older than this
+_RACY_WINDOW_NS = 1_000_000_000
+
+
+def _split_lines(text: str) -> list[str]:
+    """Split text into lines the way readlines() splits a file.
+
+    Unlike str.splitlines(), form feeds, U+2028 and the other Unicode line
+    separators stay inside a line, so both sides of a diff number lines alike.
+
+    Args:
+        text (str): Text to split.
+
+    Returns:
+        list[str]: The text's lines, including line endings.
+    """
+    return io.StringIO(text, newline="").readlines()
+
+
+def _read_lines(full_path: Path) -> list[str]:
+    """Read a UTF-8 text file as lines, reusing the last read while it is unchanged.
+
+    The file is stat'ed through the open descriptor, so a cached entry always
+    describes the file being read. The returned list may be shared with other
+    callers and must not be modified.
+
+    Args:
+        full_path (Path): Validated file path.
+
+    Returns:
+        list[str]: The file's lines, including line endings.
+
+    Raises:
+        OSError: If the file cannot be opened or read.
+        UnicodeDecodeError: If the file is not valid UTF-8.
+    """
+    global _lines_cache_bytes
+    key = str(full_path)
+    with open(full_path, "r", encoding="utf-8") as f:
+        st = os.fstat(f.fileno())
+        signature = (st.st_mtime_ns, st.st_size, st.st_ino)
+        with _lines_cache_lock:
+            cached = _LINES_CACHE.get(key)
+            if cached is not None and cached[0] == signature:
+                _LINES_CACHE.move_to_end(key)
+                return cached[1]
+        lines = f.readlines()
+
+    if time.time_ns() - st.st_mtime_ns < _RACY_WINDOW_NS or st.st_size > _LINES_CACHE_MAX_BYTES:
+        return lines
+    with _lines_cache_lock:
+        previous = _LINES_CACHE.pop(key, None)
+        if previous is not None:
+            _lines_cache_bytes -= previous[0][1]
+        _LINES_CACHE[key] = (signature, lines)
+        _lines_cache_bytes += st.st_size
+        while _lines_cache_bytes > _LINES_CACHE_MAX_BYTES:
+            _, (evicted_signature, _) = _LINES_CACHE.popitem(last=False)
+            _lines_cache_bytes -= evicted_signature[1]
+    return lines
+
+
+def _write_text_atomic(full_path: Path, content: str) -> None:
+    """Write a UTF-8 text file by renaming a temporary file over it.
+
+    Readers see either the old or the new content, never a partial write. An
+    existing file keeps its permission bits; a new one gets the umask default.
+
+    Args:
+        full_path (Path): Validated file path.
+        content (str): Content to write.
+
+    Raises:
+        OSError: If the file cannot be written.
+    """
+    # Dot-prefixed, so listings and grep skip it while it exists
+    tmp_path = full_path.with_name(f".{full_path.name}.{uuid.uuid4().hex[:8]}.tmp")
+    try:
+        with open(tmp_path, "x", encoding="utf-8") as f:
+            f.write(content)
+        try:
+            os.chmod(tmp_path, stat.S_IMODE(os.stat(full_path).st_mode))
+        except FileNotFoundError:
+            pass
+        os.replace(tmp_path, full_path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+
+def _number_lines(lines: list[str], start: int) -> str:
+    """Prefix lines with right-aligned line numbers, joining them in one pass.
+
+    Args:
+        lines (list[str]): Lines including their line endings.
+        start (int): Number of the first line.
+
+    Returns:
+        str: The numbered lines.
+    """
+    return "".join([f"{i:6d}\t{line}" for i, line in enumerate(lines, start=start)])
+
+
 def _run_async(coro):
     """Run an async coroutine from sync code, handling uvloop properly.
     
@@ -63,6 +520,9 @@ class MCPTools:
         self.workspace_path = Path(workspace_path).resolve()
         if not self.workspace_path.exists():
             self.workspace_path.mkdir(parents=True, exist_ok=True)
+        # Precomputed for _validate_path's containment check
+        self._workspace_str = str(self.workspace_path)
+        self._workspace_prefix = self._workspace_str.rstrip(os.sep) + os.sep
 
     def _validate_path(self, path: str) -> Path:
         """Validate that path is within workspace.
@@ -77,84 +537,73 @@ class MCPTools:
             ValueError: If path is outside workspace.
         """
         full_path = (self.workspace_path / path).resolve()
-        if not str(full_path).startswith(str(self.workspace_path)):
+        # Compare against "<workspace>/" so a sibling like "<workspace>-other" is rejected
+        full_str = str(full_path)
+        if full_str != self._workspace_str and not full_str.startswith(self._workspace_prefix):
             raise ValueError(f"Path {path} is outside workspace")
         return full_path
 
+    def resolve_file(self, path: str) -> Path | None:
+        """Resolve a workspace-relative path to an existing regular file.
+
+        Args:
+            path (str): Relative path within workspace.
+
+        Returns:
+            Path | None: The absolute path, or None if it is not a file.
+
+        Raises:
+            ValueError: If path is outside workspace.
+        """
+        full_path = self._validate_path(path)
+        return full_path if full_path.is_file() else None
+
     def _generate_diff(
-        self, path: str, old_content: str, new_content: str
+        self, path: str, old_lines: list[str], new_lines: list[str]
     ) -> dict[str, Any] | None:
-        """Generate structured diff data using difflib.
+        """Generate structured diff data for a file edit.
+
+        Callers pass the lines they already have (from readlines() or a single
+        _split_lines() pass), so the content is never split twice. Large inputs
+        are diffed by diff(1) when it is installed, small ones by difflib.
 
         Args:
             path (str): File path for context.
-            old_content (str): Original file content.
-            new_content (str): New file content.
+            old_lines (list[str]): Original file lines, with line endings.
+            new_lines (list[str]): New file lines, with line endings.
 
         Returns:
             dict[str, Any] | None: Structured diff data or None if no changes.
         """
         # Skip diff generation for very large files (>10,000 lines)
-        old_lines = old_content.splitlines(keepends=True)
-        new_lines = new_content.splitlines(keepends=True)
-
         if len(old_lines) > 10000 or len(new_lines) > 10000:
             return None
+        # A no-op edit; list comparison stops at the first differing line
+        if old_lines == new_lines:
+            return None
 
-        # Generate unified diff
-        diff_lines = list(
-            difflib.unified_diff(
-                old_lines,
-                new_lines,
-                fromfile=f"a/{path}",
-                tofile=f"b/{path}",
-                lineterm="",
-            )
-        )
-
-        if not diff_lines:
+        hunks = None
+        if (
+            _DIFF_PATH
+            and old_lines
+            and new_lines
+            and len(old_lines) + len(new_lines) >= _EXTERNAL_DIFF_MIN_LINES
+        ):
+            hunks = _external_diff_hunks(old_lines, new_lines)
+        if hunks is None:
+            hunks = _difflib_hunks(old_lines, new_lines)
+
+        if not hunks:
             return None
 
-        # Parse diff into hunks
-        hunks = []
-        current_hunk = None
         lines_added = 0
         lines_removed = 0
-
-        for line in diff_lines:
-            # Skip header lines
-            if line.startswith("---") or line.startswith("+++"):
-                continue
-
-            # Hunk header line
-            if line.startswith("@@"):
-                if current_hunk:
-                    hunks.append(current_hunk)
-                current_hunk = {"header": line, "changes": []}
-                continue
-
-            # Content lines
-            if current_hunk is not None:
-                if line.startswith("+"):
-                    current_hunk["changes"].append(
-                        {"type": "added", "line": line[1:]}
-                    )
+        for hunk in hunks:
+            for change in hunk["changes"]:
+                if change["type"] == "added":
                     lines_added += 1
-                elif line.startswith("-"):
-                    current_hunk["changes"].append(
-                        {"type": "removed", "line": line[1:]}
-                    )
+                elif change["type"] == "removed":
                     lines_removed += 1
-                else:
-                    # Context line (starts with space or is empty)
-                    current_hunk["changes"].append(
-                        {"type": "context", "line": line[1:] if line else ""}
-                    )
-
-        # Add last hunk
-        if current_hunk:
-            hunks.append(current_hunk)
-
         lines_changed = min(lines_added, lines_removed)
 
         return {
@@ -185,8 +634,7 @@ class MCPTools:
             if not full_path.exists():
                 return {"error": f"File not found: {path}"}
 
-            with open(full_path, "r", encoding="utf-8") as f:
-                all_lines = f.readlines()
+            all_lines = _read_lines(full_path)
 
             total_lines = len(all_lines)
 
@@ -203,9 +651,7 @@ class MCPTools:
                 content = "".join(selected_lines)
 
                 # Add line numbers for context
-                numbered_content = ""
-                for i, line in enumerate(selected_lines, start=start_idx + 1):
-                    numbered_content += f"{i:6d}\t{line}"
+                numbered_content = _number_lines(selected_lines, start_idx + 1)
 
                 return {
                     "success": True,
@@ -222,10 +668,7 @@ class MCPTools:
                 content = "".join(all_lines)
 
                 if total_lines <= 2000:
-                    numbered_content = ""
-                    for i, line in enumerate(all_lines, start=1):
-                        numbered_content += f"{i:6d}\t{line}"
-                    display_content = numbered_content
+                    display_content = _number_lines(all_lines, 1)
                 else:
                     # For very large files, show truncated with hint
                     display_content = "".join(all_lines[:1000])
@@ -261,20 +704,33 @@ class MCPTools:
             file_existed = full_path.exists()
             old_content = None
 
-            # Read old content if file exists
+            # Read old content if file exists. newline="" keeps \r\n as stored, so
+            # rewriting a CRLF file with LF content is not mistaken for a no-op.
             if file_existed:
                 try:
-                    with open(full_path, "r", encoding="utf-8") as f:
+                    with open(full_path, "r", encoding="utf-8", newline="") as f:
                         old_content = f.read()
                 except Exception:
                     # If read fails, treat as new file
                     old_content = None
 
+            # Identical content: skip the write, the read-back and the diff.
+            # str equality is a length check plus memcmp, cheaper than hashing.
+            if old_content == content:
+                logger.info("File write skipped - content unchanged", path=path, size=len(content))
+                return {
+                    "success": True,
+                    "path": path,
+                    "size": len(content),
+                    "action": "unchanged",
+                    "content": content,
+                    "verified": True,
+                }
+
             full_path.parent.mkdir(parents=True, exist_ok=True)
 
             # Write new content
-            with open(full_path, "w", encoding="utf-8") as f:
-                f.write(content)
+            _write_text_atomic(full_path, content)
             
             # CRITICAL: Verify file was actually written to disk
             if not full_path.exists():
@@ -320,7 +776,9 @@ class MCPTools:
 
             # Generate diff for modified files
             if file_existed and old_content is not None:
-                diff_data = self._generate_diff(path, old_content, content)
+                diff_data = self._generate_diff(
+                    path, _split_lines(old_content), _split_lines(content)
+                )
                 if diff_data:
                     result["diff"] = diff_data
 
@@ -350,10 +808,7 @@ class MCPTools:
                 return {"error": f"File not found: {path}"}
 
             # Read existing content
-            with open(full_path, "r", encoding="utf-8") as f:
-                lines = f.readlines()
-
-            old_content = "".join(lines)
+            lines = _read_lines(full_path)
 
             # Validate line numbers
             if start_line < 1 or end_line < start_line or start_line > len(lines):
@@ -371,8 +826,7 @@ class MCPTools:
             new_content = "".join(new_lines)
 
             # Write modified content
-            with open(full_path, "w", encoding="utf-8") as f:
-                f.write(new_content)
+            _write_text_atomic(full_path, new_content)
 
             result = {
                 "success": True,
@@ -382,7 +836,8 @@ class MCPTools:
             }
 
             # Generate diff
-            diff_data = self._generate_diff(path, old_content, new_content)
+            # The replacement may span several lines, so only the old side is reused
+            diff_data = self._generate_diff(path, lines, _split_lines(new_content))
             if diff_data:
                 result["diff"] = diff_data
 
@@ -426,8 +881,7 @@ class MCPTools:
             num_replacements = old_content.count(search) if count == -1 else min(count, old_content.count(search))
 
             # Write modified content
-            with open(full_path, "w", encoding="utf-8") as f:
-                f.write(new_content)
+            _write_text_atomic(full_path, new_content)
 
             result = {
                 "success": True,
@@ -437,7 +891,9 @@ class MCPTools:
             }
 
             # Generate diff
-            diff_data = self._generate_diff(path, old_content, new_content)
+            diff_data = self._generate_diff(
+                path, _split_lines(old_content), _split_lines(new_content)
+            )
             if diff_data:
                 result["diff"] = diff_data
 
@@ -465,10 +921,7 @@ class MCPTools:
                 return {"error": f"File not found: {path}"}
 
             # Read existing content
-            with open(full_path, "r", encoding="utf-8") as f:
-                lines = f.readlines()
-
-            old_content = "".join(lines)
+            lines = _read_lines(full_path)
 
             # Validate line number
             if line_number < 1 or line_number > len(lines) + 1:
@@ -482,8 +935,7 @@ class MCPTools:
             new_content = "".join(new_lines)
 
             # Write modified content
-            with open(full_path, "w", encoding="utf-8") as f:
-                f.write(new_content)
+            _write_text_atomic(full_path, new_content)
 
             result = {
                 "success": True,
@@ -493,7 +945,8 @@ class MCPTools:
             }
 
             # Generate diff
-            diff_data = self._generate_diff(path, old_content, new_content)
+            # The replacement may span several lines, so only the old side is reused
+            diff_data = self._generate_diff(path, lines, _split_lines(new_content))
             if diff_data:
                 result["diff"] = diff_data
 
@@ -522,20 +975,30 @@ class MCPTools:
             if not full_path.is_dir():
                 return {"error": f"Path is not a directory: {path}"}
 
-            items = []
-            for item in sorted(full_path.iterdir()):
+            # Workspace-relative prefix shared by every entry
+            rel_dir = str(full_path.relative_to(self.workspace_path))
+            prefix = "" if rel_dir == "." else rel_dir + os.sep
+
+            # scandir's DirEntry caches the type from the directory read, so only
+            # files (for their size) and symlinks need a stat() call
+            with os.scandir(full_path) as it:
                 # Skip hidden files
-                if item.name.startswith("."):
-                    continue
+                entries = sorted(
+                    (entry for entry in it if not entry.name.startswith(".")),
+                    key=lambda entry: entry.name,
+                )
 
+            items = []
+            for entry in entries:
+                is_dir = entry.is_dir()
                 item_info = {
-                    "name": item.name,
-                    "type": "directory" if item.is_dir() else "file",
-                    "path": str(item.relative_to(self.workspace_path)),
+                    "name": entry.name,
+                    "type": "directory" if is_dir else "file",
+                    "path": prefix + entry.name,
                 }
 
-                if item.is_file():
-                    item_info["size"] = item.stat().st_size
+                if not is_dir and entry.is_file():
+                    item_info["size"] = entry.stat().st_size
 
                 items.append(item_info)
 
@@ -911,101 +1374,20 @@ class MCPTools:
             except re.error as e:
                 return {"error": f"Invalid regex pattern: {e}"}
 
-            matches = []
-            files_searched = 0
-            total_matches = 0
-
-            def search_file(file_path: Path) -> None:
-                """Search a single file for pattern matches."""
-                nonlocal files_searched, total_matches
-
-                try:
-                    # Skip binary files and very large files
-                    if file_path.stat().st_size > 10_000_000:  # Skip files > 10MB
-                        return
-
-                    with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
-                        lines = f.readlines()
-
-                    files_searched += 1
-                    matched_lines = []
-
-                    for line_num, line in enumerate(lines, start=1):
-                        if regex.search(line):
-                            matched_lines.append(line_num)
-
-                    if matched_lines:
-                        total_matches += len(matched_lines)
-                        relative_path = str(file_path.relative_to(self.workspace_path))
-
-                        if files_only:
-                            # Just return filename
-                            matches.append({
-                                "file": relative_path,
-                                "match_count": len(matched_lines)
-                            })
-                        else:
-                            # Return detailed matches with context
-                            file_matches = []
-                            for line_num in matched_lines:
-                                match_info = {
-                                    "line_number": line_num,
-                                    "line": lines[line_num - 1].rstrip()
-                                }
-
-                                # Add context lines if requested
-                                if context_lines > 0:
-                                    context_before = []
-                                    context_after = []
-
-                                    for i in range(1, context_lines + 1):
-                                        if line_num - i > 0:
-                                            context_before.insert(0, {
-                                                "line_number": line_num - i,
-                                                "line": lines[line_num - i - 1].rstrip()
-                                            })
-                                        if line_num + i <= len(lines):
-                                            context_after.append({
-                                                "line_number": line_num + i,
-                                                "line": lines[line_num + i - 1].rstrip()
-                                            })
-
-                                    if context_before:
-                                        match_info["context_before"] = context_before
-                                    if context_after:
-                                        match_info["context_after"] = context_after
-
-                                file_matches.append(match_info)
-
-                            matches.append({
-                                "file": relative_path,
-                                "match_count": len(matched_lines),
-                                "matches": file_matches
-                            })
-
-                except (UnicodeDecodeError, PermissionError):
-                    # Skip files that can't be read
-                    pass
-
-            # Search files
-            if full_path.is_file():
-                # Search single file
-                search_file(full_path)
-            elif full_path.is_dir():
-                # Search directory
-                if recursive:
-                    # Recursive search
-                    for file_path in full_path.rglob("*"):
-                        if file_path.is_file() and not file_path.name.startswith("."):
-                            search_file(file_path)
-                else:
-                    # Non-recursive search (only immediate files)
-                    for file_path in full_path.iterdir():
-                        if file_path.is_file() and not file_path.name.startswith("."):
-                            search_file(file_path)
-            else:
+            if not (full_path.is_file() or full_path.is_dir()):
                 return {"error": f"Path is neither file nor directory: {path}"}
 
+            # ripgrep is far faster on large trees; the Python search covers patterns
+            # its engine rejects or reads differently and hosts without it installed
+            result = None
+            if _RG_PATH and not _uses_class_set_syntax(pattern):
+                result = self._grep_ripgrep(
+                    pattern, full_path, recursive, case_insensitive, files_only, context_lines
+                )
+            if result is None:
+                result = self._grep_python(regex, full_path, recursive, files_only, context_lines)
+            matches, files_searched, total_matches = result
+
             return {
                 "success": True,
                 "pattern": pattern,
@@ -1021,6 +1403,267 @@ class MCPTools:
         except Exception as e:
             return {"error": str(e)}
 
+    def _grep_python(
+        self,
+        regex: re.Pattern[str],
+        full_path: Path,
+        recursive: bool,
+        files_only: bool,
+        context_lines: int,
+    ) -> tuple[list[dict[str, Any]], int, int]:
+        """Search files line by line with Python's re module.
+
+        Args:
+            regex (re.Pattern[str]): Compiled pattern to search for.
+            full_path (Path): Validated file or directory to search.
+            recursive (bool): Search recursively in directories.
+            files_only (bool): Only count matches per file.
+            context_lines (int): Number of context lines to show around matches.
+
+        Returns:
+            tuple[list[dict[str, Any]], int, int]: Per-file matches, files searched
+            and total matches.
+        """
+        matches = []
+        files_searched = 0
+        total_matches = 0
+
+        # Searching a whole file once in MULTILINE mode finds a match whenever some
+        # line matches, so files without one skip the per-line loop. Look-around,
+        # \A/\Z and newlines see past line boundaries differently (a negative
+        # look-ahead can fail on the next line's text), so patterns with any of
+        # them go line by line.
+        prefilter = None
+        if not any(
+            token in regex.pattern
+            for token in ("(?<", "(?=", "(?!", "\\A", "\\Z", "\\n", "\n")
+        ):
+            prefilter = re.compile(regex.pattern, regex.flags | re.MULTILINE)
+        # A case-sensitive plain-text pattern can be looked for in the raw bytes,
+        # before decoding. Newlines are excluded since text mode rewrites \r\n.
+        literal = None
+        if not regex.flags & re.IGNORECASE and not any(
+            char in _REGEX_SPECIAL_CHARS for char in regex.pattern
+        ):
+            literal = regex.pattern.encode("utf-8")
+
+        def search_file(file_path: str, size: int, skip_binary: bool = True) -> None:
+            """Search a single file for pattern matches."""
+            nonlocal files_searched, total_matches
+
+            try:
+                # Skip binary files and very large files
+                if size > 10_000_000:  # Skip files > 10MB
+                    return
+
+                with open(file_path, "rb") as f:
+                    data = f.read()
+                files_searched += 1
+                if data.startswith(_UTF16_BOMS):
+                    # Transcoded like ripgrep does; the byte checks below don't apply
+                    content = data.decode("utf-16", errors="replace")
+                    if skip_binary and "\0" in content[:8192]:
+                        return
+                else:
+                    # A NUL byte near the start marks a binary file, as ripgrep decides
+                    if skip_binary and b"\0" in data[:8192]:
+                        return
+                    if literal is not None and literal not in data:
+                        return
+                    # Decoding the bytes in one call is faster than a text-mode read.
+                    # ripgrep drops a UTF-8 BOM too.
+                    encoding = "utf-8-sig" if data.startswith(codecs.BOM_UTF8) else "utf-8"
+                    content = data.decode(encoding, errors="ignore")
+                # Newlines are translated as text mode would
+                if "\r" in content:
+                    content = content.replace("\r\n", "\n").replace("\r", "\n")
+
+                if prefilter is not None and not prefilter.search(content):
+                    return
+                # Lines are searched without their terminator, as ripgrep does, so
+                # \s, [^a] and (?s). cannot match the newline
+                lines = content.split("\n")
+                if lines[-1] == "":
+                    lines.pop()
+                matched_lines = []
+
+                for line_num, line in enumerate(lines, start=1):
+                    if regex.search(line):
+                        matched_lines.append(line_num)
+
+                if matched_lines:
+                    total_matches += len(matched_lines)
+                    relative_path = os.path.relpath(file_path, self._workspace_str)
+
+                    if files_only:
+                        # Just return filename
+                        matches.append({
+                            "file": relative_path,
+                            "match_count": len(matched_lines)
+                        })
+                    else:
+                        # Return detailed matches with context
+                        file_matches = []
+                        for line_num in matched_lines:
+                            match_info = {
+                                "line_number": line_num,
+                                "line": lines[line_num - 1].rstrip()
+                            }
+
+                            # Add context lines if requested
+                            if context_lines > 0:
+                                context_before = []
+                                context_after = []
+
+                                for i in range(1, context_lines + 1):
+                                    if line_num - i > 0:
+                                        context_before.insert(0, {
+                                            "line_number": line_num - i,
+                                            "line": lines[line_num - i - 1].rstrip()
+                                        })
+                                    if line_num + i <= len(lines):
+                                        context_after.append({
+                                            "line_number": line_num + i,
+                                            "line": lines[line_num + i - 1].rstrip()
+                                        })
+
+                                if context_before:
+                                    match_info["context_before"] = context_before
+                                if context_after:
+                                    match_info["context_after"] = context_after
+
+                            file_matches.append(match_info)
+
+                        matches.append({
+                            "file": relative_path,
+                            "match_count": len(matched_lines),
+                            "matches": file_matches
+                        })
+
+            except (UnicodeDecodeError, PermissionError):
+                # Skip files that can't be read
+                pass
+
+        # Search files
+        if full_path.is_file():
+            # Search single file
+            # A file named explicitly is searched even if it looks binary
+            search_file(str(full_path), full_path.stat().st_size, skip_binary=False)
+        else:
+            # Search directory
+            for entry in _iter_search_files(str(full_path), recursive):
+                try:
+                    size = entry.stat(follow_symlinks=False).st_size
+                except OSError:
+                    continue
+                search_file(entry.path, size)
+            # Report files in a stable order, as the ripgrep search does
+            matches.sort(key=lambda entry: entry["file"])
+
+        return matches, files_searched, total_matches
+
+    def _grep_ripgrep(
+        self,
+        pattern: str,
+        full_path: Path,
+        recursive: bool,
+        case_insensitive: bool,
+        files_only: bool,
+        context_lines: int,
+    ) -> tuple[list[dict[str, Any]], int, int] | None:
+        """Search with ripgrep, producing the same matches as the Python search.
+
+        Like the Python search, this skips dot files, dot directories, binary
+        files and files over 10MB, does not follow symlinks and does not apply
+        .gitignore rules.
+
+        Args:
+            pattern (str): Regular expression pattern to search for.
+            full_path (Path): Validated file or directory to search.
+            recursive (bool): Search recursively in directories.
+            case_insensitive (bool): Case-insensitive search.
+            files_only (bool): Only count matches per file.
+            context_lines (int): Number of context lines to show around matches.
+
+        Returns:
+            tuple[list[dict[str, Any]], int, int] | None: Per-file matches, files
+            searched and total matches, or None if ripgrep could not run the
+            search (e.g. the pattern uses look-around, which its engine lacks).
+        """
+        # The Python search's size limit is 10_000_000 bytes; rg's "10M" means 10 MiB
+        walk_args = ["--no-ignore", "--no-messages", "--max-filesize", str(10_000_000)]
+        if full_path.is_dir() and not recursive:
+            walk_args.extend(["--max-depth", "1"])
+        # --crlf lets $ match before \r\n, as it does on the lines the Python search reads
+        cmd = [_RG_PATH, "--json", "--crlf", *walk_args]
+        if case_insensitive:
+            cmd.append("-i")
+        if context_lines > 0 and not files_only:
+            cmd.extend(["--context", str(context_lines)])
+        cmd.extend(["-e", pattern, "--", str(full_path)])
+
+        matches = []
+        completed = False
+        total_matches = 0
+        lines: dict[int, str] = {}
+        matched_lines: list[int] = []
+
+        with subprocess.Popen(
+            cmd,
+            cwd=str(self.workspace_path),
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        ) as process:
+            for raw in process.stdout:
+                message = orjson.loads(raw)
+                data = message["data"]
+                kind = message["type"]
+                if kind == "begin":
+                    lines = {}
+                    matched_lines = []
+                elif kind == "match" or kind == "context":
+                    line_num = data["line_number"]
+                    lines[line_num] = _rg_text(data["lines"]).rstrip()
+                    if kind == "match":
+                        matched_lines.append(line_num)
+                elif kind == "end" and matched_lines:
+                    total_matches += len(matched_lines)
+                    relative_path = str(
+                        Path(_rg_text(data["path"])).relative_to(self.workspace_path)
+                    )
+                    file_entry: dict[str, Any] = {
+                        "file": relative_path,
+                        "match_count": len(matched_lines),
+                    }
+                    if not files_only:
+                        file_entry["matches"] = [
+                            _grep_match_entry(line_num, lines, context_lines)
+                            for line_num in matched_lines
+                        ]
+                    matches.append(file_entry)
+                elif kind == "summary":
+                    completed = True
+
+        # A fatal error (such as an unsupported pattern) ends the run before the summary
+        if not completed:
+            return None
+        # The summary only counts files that produced output, so list the walked
+        # files separately; this reads directory entries, not file contents
+        if full_path.is_dir():
+            listing = subprocess.run(
+                [_RG_PATH, "--files", *walk_args, "--", str(full_path)],
+                cwd=str(self.workspace_path),
+                stdin=subprocess.DEVNULL,
+                capture_output=True,
+            )
+            files_searched = listing.stdout.count(b"\n")
+        else:
+            files_searched = 1
+        # ripgrep searches files in parallel; report them in a stable order
+        matches.sort(key=lambda entry: entry["file"])
+        return matches, files_searched, total_matches
+
     def run_python(
         self, file_path: str, stdin_input: str = "", args: str = ""
     ) -> dict[str, Any]:
@@ -1041,16 +1684,10 @@ class MCPTools:
 
             cmd = ["python3", str(full_path)]
             if args:
-                cmd.extend(shlex.split(args))
+                cmd.extend(_split_command(args))
 
-            result = subprocess.run(
-                cmd,
-                shell=False,
-                cwd=str(self.workspace_path),
-                capture_output=True,
-                text=True,
-                timeout=10,
-                input=stdin_input if stdin_input else None,
+            result = _run_process(
+                cmd, str(self.workspace_path), timeout=10, stdin_input=stdin_input or None
             )
 
             return {
@@ -1086,14 +1723,7 @@ class MCPTools:
             else:
                 cmd.append(str(self.workspace_path))
 
-            result = subprocess.run(
-                cmd,
-                shell=False,
-                cwd=str(self.workspace_path),
-                capture_output=True,
-                text=True,
-                timeout=60,
-            )
+            result = _run_process(cmd, str(self.workspace_path), timeout=60)
 
             return {
                 "success": result.returncode == 0,
@@ -1120,19 +1750,7 @@ class MCPTools:
             dict[str, Any]: Execution result.
         """
         # Security: Block dangerous command patterns using regex
-        dangerous_patterns = [
-            r'rm\s+-rf\s+/',  # rm -rf /
-            r'rm\s+-fr\s+/',  # rm -fr / (alternate flag order)
-            r'rm\s+-rf\s+/\*',  # rm -rf /*
-            r':\(\)\{.*\}',  # Fork bomb
-            r'dd\s+if=',  # Disk destruction
-            r'mkfs\s+',  # Format filesystem
-            r'format\s+',  # Format command
-            r'>\s*/dev/sd',  # Write to block device
-            r'wget.*\|.*sh',  # Download and pipe to shell
-            r'curl.*\|.*sh',  # Download and pipe to shell
-        ]
-        if any(re.search(pattern, command, re.IGNORECASE) for pattern in dangerous_patterns):
+        if _DANGEROUS_COMMAND_RE.search(command):
             return {"error": "Command blocked for security reasons", "command": command}
 
         # Note: shell=False with shlex.split() below already prevents command injection
@@ -1148,7 +1766,7 @@ class MCPTools:
 
             # Security: Use shell=False with shlex.split() to prevent injection
             # This only allows single commands, not pipes/redirections
-            command_parts = shlex.split(command)
+            command_parts = list(_split_command(command))
             if not command_parts:
                 return {"error": "Empty command", "command": command}
 
@@ -1172,3 +1790,19 @@ class MCPTools:
             return {"error": "Command timed out after 30 seconds", "command": command}
         except Exception as e:
             return {"error": str(e), "command": command}
+
+
+@functools.lru_cache(maxsize=32)
+def get_workspace_tools(workspace_path: str) -> MCPTools:
+    """Get the shared MCPTools instance for a workspace, creating it on first use.
+
+    MCPTools holds no state beyond its resolved workspace, so one instance per
+    workspace can serve every request and worker thread.
+
+    Args:
+        workspace_path: Container-side workspace path.
+
+    Returns:
+        MCPTools: Tools rooted at the workspace.
+    """
+    return MCPTools(workspace_path)
@@ -15,7 +15,7 @@ from prometheus.database import (
     get_enabled_rules_text,
     get_memories_text,
 )
-from prometheus.mcp.tools import MCPTools
+from prometheus.mcp.tools import MCPTools, get_workspace_tools
 from prometheus.routers.health import get_model_router
 from prometheus.services.model_router import ModelRouter
 from prometheus.services.context_manager import check_and_compress_if_needed, is_reasoning_model
@@ -58,7 +58,7 @@ def get_mcp_tools(workspace: str | None = None) -> MCPTools:
     raw_path = workspace or settings.workspace_path
     # Translate host paths to container paths (for Docker)
     path = translate_host_path_to_container(raw_path)
-    return MCPTools(path)
+    return get_workspace_tools(path)
 
 
 def extract_tool_calls(text: str, log_results: bool = False) -> list[tuple[dict, int, int]]:
@@ -2413,7 +2413,7 @@ MAKE THE EDIT NOW. NO MORE EXPLANATIONS."""
                             translated_workspace = translate_host_path_to_container(
                                 request.workspace_path or settings.workspace_path
                             )
-                            mcp_tools_cleanup = MCPTools(translated_workspace)
+                            mcp_tools_cleanup = get_workspace_tools(translated_workspace)
                             result = mcp_tools_cleanup.filesystem_write(path, content)
                             logger.info("Emergency file write on cleanup", path=path, 
                                        success=result.get("success"), content_len=len(content))
@@ -2448,7 +2448,7 @@ MAKE THE EDIT NOW. NO MORE EXPLANATIONS."""
                                     pass  # If we can't read, try to write anyway
                             
                             if should_write:
-                                mcp_tools_cleanup = MCPTools(translated_workspace)
+                                mcp_tools_cleanup = get_workspace_tools(translated_workspace)
                                 result = mcp_tools_cleanup.filesystem_write(path, content)
                                 if result.get("success"):
                                     logger.info("Final cleanup: wrote previewed file", 
@@ -1,8 +1,11 @@
 """API routes for conversations and rules management."""
 import uuid
+from collections.abc import AsyncIterator
 from typing import Any
 
+import orjson
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
 from prometheus import database as db
@@ -26,6 +29,12 @@ class AddMessageRequest(BaseModel):
     content: str
 
 
+class AddMessagesRequest(BaseModel):
+    """Request model for adding several messages at once."""
+
+    messages: list[AddMessageRequest]
+
+
 class CreateRuleRequest(BaseModel):
     """Request model for creating a rule."""
 
@@ -91,8 +100,25 @@ async def create_conversation(request: CreateConversationRequest) -> dict[str, A
     return {"conversation": conversation}
 
 
+async def _stream_conversation(conversation: dict[str, Any]) -> AsyncIterator[bytes]:
+    """Encode a conversation and its messages as JSON, one message batch at a time.
+
+    Args:
+        conversation: Conversation record.
+
+    Yields:
+        bytes: Consecutive chunks of the response body.
+    """
+    yield b'{"conversation":' + orjson.dumps(conversation) + b',"messages":['
+    separator = b""
+    async for batch in db.iter_messages_json(conversation["id"]):
+        yield separator + batch
+        separator = b","
+    yield b"]}"
+
+
 @router.get("/conversations/{conv_id}")
-async def get_conversation(conv_id: str) -> dict[str, Any]:
+async def get_conversation(conv_id: str) -> StreamingResponse:
     """Get a conversation with its messages.
 
     Args:
@@ -108,8 +134,8 @@ async def get_conversation(conv_id: str) -> dict[str, Any]:
     if not conversation:
         raise HTTPException(status_code=404, detail="Conversation not found")
 
-    messages = await db.get_messages(conv_id)
-    return {"conversation": conversation, "messages": messages}
+    # Message histories can be large; stream them instead of building the whole body
+    return StreamingResponse(_stream_conversation(conversation), media_type="application/json")
 
 
 @router.delete("/conversations/{conv_id}")
@@ -126,6 +152,22 @@ async def delete_conversation(conv_id: str) -> dict[str, Any]:
     return {"success": True}
 
 
+@router.get("/conversations/{conv_id}/messages")
+async def list_messages(conv_id: str, after_id: int = 0, limit: int = 100) -> dict[str, Any]:
+    """List a page of messages in a conversation, oldest first.
+
+    Args:
+        conv_id: Conversation ID.
+        after_id: Only return messages with an id greater than this.
+        limit: Maximum number of messages to return.
+
+    Returns:
+        dict: Messages in the page.
+    """
+    messages = await db.get_messages_page(conv_id, after_id=after_id, limit=limit)
+    return {"messages": messages}
+
+
 @router.post("/conversations/{conv_id}/messages")
 async def add_message(conv_id: str, request: AddMessageRequest) -> dict[str, Any]:
     """Add a message to a conversation.
@@ -145,6 +187,24 @@ async def add_message(conv_id: str, request: AddMessageRequest) -> dict[str, Any
     return {"message": message}
 
 
+@router.post("/conversations/{conv_id}/messages/bulk")
+async def add_messages(conv_id: str, request: AddMessagesRequest) -> dict[str, Any]:
+    """Add several messages to a conversation in one transaction.
+
+    Args:
+        conv_id: Conversation ID.
+        request: Messages to add, in order.
+
+    Returns:
+        dict: Created messages.
+    """
+    messages = await db.add_messages_bulk(
+        conversation_id=conv_id,
+        messages=[(message.role, message.content, None, None) for message in request.messages],
+    )
+    return {"messages": messages}
+
+
 # Rules endpoints
 @router.get("/rules/global")
 async def list_global_rules() -> dict[str, Any]:
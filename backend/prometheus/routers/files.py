@@ -1,8 +1,11 @@
+import asyncio
+
 from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import FileResponse
 from pydantic import BaseModel
 
 from prometheus.config import settings, translate_host_path_to_container
-from prometheus.mcp.tools import MCPTools
+from prometheus.mcp.tools import MCPTools, get_workspace_tools
 
 router = APIRouter(prefix="/api/v1/files")
 
@@ -27,12 +30,12 @@ def get_mcp_tools(workspace_path: str | None = None) -> MCPTools:
         workspace_path: Optional workspace path (will be translated for Docker).
 
     Returns:
-        MCPTools: An instance of MCPTools.
+        MCPTools: The shared instance for the workspace.
     """
     raw_path = workspace_path or settings.workspace_path
     # Translate host paths to container paths (for Docker)
     translated_path = translate_host_path_to_container(raw_path)
-    return MCPTools(translated_path)
+    return get_workspace_tools(translated_path)
 
 
 @router.get("/list")
@@ -53,7 +56,7 @@ async def list_directory(
         HTTPException: If directory listing fails.
     """
     mcp_tools = get_mcp_tools(workspace_path)
-    result = mcp_tools.filesystem_list(path)
+    result = await asyncio.to_thread(mcp_tools.filesystem_list, path)
 
     if "error" in result:
         raise HTTPException(status_code=404, detail=result["error"])
@@ -79,7 +82,7 @@ async def read_file(
         HTTPException: If file reading fails.
     """
     mcp_tools = get_mcp_tools(workspace_path)
-    result = mcp_tools.filesystem_read(path)
+    result = await asyncio.to_thread(mcp_tools.filesystem_read, path)
 
     if "error" in result:
         raise HTTPException(status_code=404, detail=result["error"])
@@ -87,6 +90,39 @@ async def read_file(
     return result
 
 
+@router.get("/raw")
+async def read_file_raw(
+    path: str = Query(..., description="Relative path to file within workspace"),
+    workspace_path: str | None = Query(
+        default=None, description="Workspace path (for Docker translation)"
+    ),
+) -> FileResponse:
+    """Stream the raw bytes of a file in the workspace.
+
+    Unlike /content, the file is sent in chunks straight from disk without being
+    decoded or numbered, so large files don't have to fit in memory.
+
+    Args:
+        path (str): Relative path to file within workspace.
+        workspace_path (str | None): Optional workspace path for Docker translation.
+
+    Returns:
+        FileResponse: The file contents.
+
+    Raises:
+        HTTPException: If the path is outside the workspace or not a file.
+    """
+    mcp_tools = get_mcp_tools(workspace_path)
+    try:
+        full_path = await asyncio.to_thread(mcp_tools.resolve_file, path)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+    if full_path is None:
+        raise HTTPException(status_code=404, detail=f"File not found: {path}")
+
+    return FileResponse(full_path)
+
+
 class FileContentWriteRequest(BaseModel):
     """Request model for writing file content with optional workspace."""
 
@@ -111,7 +147,7 @@ async def write_file(
         HTTPException: If file writing fails.
     """
     mcp_tools = get_mcp_tools(request.workspace_path)
-    result = mcp_tools.filesystem_write(request.path, request.content)
+    result = await asyncio.to_thread(mcp_tools.filesystem_write, request.path, request.content)
 
     if "error" in result:
         raise HTTPException(status_code=500, detail=result["error"])
@@ -137,7 +173,7 @@ async def delete_file(
         HTTPException: If file deletion fails.
     """
     mcp_tools = get_mcp_tools(workspace_path)
-    result = mcp_tools.filesystem_delete(path)
+    result = await asyncio.to_thread(mcp_tools.filesystem_delete, path)
 
     if "error" in result:
         status_code = 404 if "not found" in result["error"].lower() else 500
@@ -147,7 +183,7 @@ async def delete_file(
 
 
 @router.get("/search")
-async def search_files(
+def search_files(
     query: str = Query(..., description="Search query (filename or content)"),
     path: str = Query(default="", description="Relative path to search within (empty for root)"),
     search_content: bool = Query(default=False, description="Search file contents in addition to filenames"),
@@ -164,6 +200,7 @@ async def search_files(
     Returns:
         dict: Search results with matching files.
     """
+    # A plain def, so FastAPI runs the blocking directory walk in its threadpool
     import os
     from pathlib import Path
     
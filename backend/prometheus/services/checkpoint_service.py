@@ -1,8 +1,7 @@
 import uuid
-from datetime import datetime, timezone
 from typing import List, Dict, Any, Optional
 import aiosqlite
-from prometheus.database import DB_PATH
+from prometheus.database import DB_PATH, utcnow_iso
 
 class CheckpointService:
     """Manages file checkpoints for undo/rollback functionality."""
@@ -10,7 +9,7 @@ class CheckpointService:
     async def create_checkpoint(self, workspace_path: str, file_paths: List[str], description: Optional[str] = None, conversation_id: Optional[str] = None) -> str:
         """Create a checkpoint for one or more files."""
         checkpoint_id = str(uuid.uuid4())
-        now = datetime.now(timezone.utc).isoformat()
+        now = utcnow_iso()
         
         async with aiosqlite.connect(DB_PATH) as db:
             for path in file_paths:
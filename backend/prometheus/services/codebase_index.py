@@ -1,12 +1,11 @@
 import json
 import asyncio
 import numpy as np
-from datetime import datetime, timezone
 from pathlib import Path
 from typing import List, Dict, Any, Optional, Callable
 import aiosqlite
 import structlog
-from prometheus.database import DB_PATH
+from prometheus.database import DB_PATH, utcnow_iso
 from prometheus.services.embeddings import EmbeddingsService
 
 logger = structlog.get_logger()
@@ -204,7 +203,7 @@ class CodebaseIndex:
             return
 
         chunks = await self.embeddings_service.embed_file(content)
-        now = datetime.now(timezone.utc).isoformat()
+        now = utcnow_iso()
         
         should_close = False
         if db is None:
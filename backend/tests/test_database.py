@@ -0,0 +1,314 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import orjson
+import pytest
+from cryptography.fernet import Fernet
+
+from prometheus import database as db
+from prometheus.config import settings
+
+
+@pytest.fixture(autouse=True)
+async def isolated_db(tmp_path, monkeypatch):
+    """Point the module at a fresh database under tmp_path for each test."""
+    monkeypatch.setattr(settings, "database_path", str(tmp_path))
+    monkeypatch.setattr(db, "DB_PATH", tmp_path / "prometheus.db")
+    monkeypatch.setattr(db, "_LEGACY_KEY_CACHE_PATH", tmp_path / ".fernet_key")
+    monkeypatch.setattr(db, "_db", None)
+    db.clear_caches()
+    yield
+    await db.close_db()
+    db.clear_caches()
+
+
+@pytest.fixture
+async def setup_db():
+    await db.init_db()
+
+
+@pytest.mark.asyncio
+async def test_enabled_rules_text_tracks_rule_writes(setup_db):
+    workspace = f"/tmp/rules-{uuid.uuid4()}"
+
+    rule = await db.add_project_rule(workspace, "style", "Use tabs")
+    text = await db.get_enabled_rules_text(workspace)
+    assert "[Project Rule: style]\nUse tabs" in text
+
+    # Served from cache until a rule changes
+    assert await db.get_enabled_rules_text(workspace) == text
+
+    await db.delete_project_rule(rule["id"])
+    assert "Use tabs" not in await db.get_enabled_rules_text(workspace)
+
+    global_rule = await db.add_global_rule("tone", "Be brief")
+    assert "[Global Rule: tone]\nBe brief" in await db.get_enabled_rules_text(workspace)
+
+    await db.update_global_rule(global_rule["id"], "tone", "Be brief", enabled=False)
+    assert "Be brief" not in await db.get_enabled_rules_text(workspace)
+
+    await db.delete_global_rule(global_rule["id"])
+
+
+@pytest.mark.asyncio
+async def test_init_db_tags_legacy_sensitive_settings(setup_db):
+    conn = await db.get_db()
+    legacy = db._fernet.encrypt(b"sk-legacy").decode()
+    await conn.executemany(
+        "INSERT OR REPLACE INTO settings (key, value, updated_at) VALUES (?, ?, '')",
+        [("legacy_api_key", legacy), ("plain_api_key", "sk-plain")],
+    )
+    await conn.commit()
+
+    await db.init_db()
+
+    async with conn.execute(
+        "SELECT value FROM settings WHERE key IN ('legacy_api_key', 'plain_api_key')"
+    ) as cursor:
+        stored = [row["value"] for row in await cursor.fetchall()]
+    assert all(value.startswith("enc1:") for value in stored)
+    assert await db.get_setting("legacy_api_key") == "sk-legacy"
+    assert await db.get_setting("plain_api_key") == "sk-plain"
+
+
+
+@pytest.mark.asyncio
+async def test_undecryptable_settings_read_as_missing(setup_db):
+    conn = await db.get_db()
+    foreign = Fernet(Fernet.generate_key()).encrypt(b"sk-foreign").decode()
+    unreadable = {
+        "tampered_api_key": "enc1:AAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAA",
+        "bad_base64_api_key": "enc1:abc",
+        "empty_api_key": "enc1:",
+        "truncated_api_key": "enc1:AAAA",
+        "foreign_api_key": foreign,
+    }
+    await conn.executemany(
+        "INSERT OR REPLACE INTO settings (key, value, updated_at) VALUES (?, ?, '')",
+        list(unreadable.items()),
+    )
+    await conn.commit()
+    await db.set_setting("blank_api_key", "")
+
+    await db.init_db()
+
+    async with conn.execute("SELECT value FROM settings WHERE key = 'foreign_api_key'") as cursor:
+        assert (await cursor.fetchone())["value"] == foreign
+    for key in unreadable:
+        assert await db.get_setting(key) is None
+    all_settings = await db.get_all_settings()
+    assert not unreadable.keys() & all_settings.keys()
+    assert await db.get_setting("blank_api_key") == ""
+    assert all_settings["blank_api_key"] == ""
+
+
+def test_utcnow_iso_matches_isoformat():
+    stamp = db.utcnow_iso()
+    parsed = datetime.fromisoformat(stamp)
+    assert parsed.tzinfo == timezone.utc
+    assert abs(datetime.now(timezone.utc) - parsed) < timedelta(seconds=5)
+    assert stamp == parsed.isoformat(timespec="microseconds")
+
+
+@pytest.mark.asyncio
+async def test_add_messages_bulk_returns_ids_in_order(setup_db):
+    conv_id = str(uuid.uuid4())
+    await db.create_conversation(conv_id, "Bulk", "/tmp", "model")
+    # Enough rows to need a second INSERT batch
+    count = db._MAX_HOST_PARAMETERS // 6 + 5
+
+    created = await db.add_messages_bulk(
+        conv_id, [("user", f"message {i}", None, None) for i in range(count)]
+    )
+
+    stored = await db.get_messages(conv_id)
+    assert [m["id"] for m in created] == [m["id"] for m in stored]
+    assert [m["content"] for m in stored] == [f"message {i}" for i in range(count)]
+
+
+@pytest.mark.asyncio
+async def test_bulk_messages_read_back_in_insert_order(setup_db):
+    conv_id = str(uuid.uuid4())
+    await db.create_conversation(conv_id, "Turn", "/tmp", "model")
+    # One batch shares a single timestamp, so readers must break ties by id
+    roles = ["user", "assistant"] * 4
+    created = await db.add_messages_bulk(
+        conv_id, [(role, f"part {i}", None, None) for i, role in enumerate(roles)]
+    )
+    expected = [m["id"] for m in created]
+    assert len({m["timestamp"] for m in created}) == 1
+
+    assert [m["id"] for m in await db.get_messages(conv_id)] == expected
+    streamed = [m async for batch in db.iter_messages(conv_id, batch_size=3) for m in batch]
+    assert [m["id"] for m in streamed] == expected
+    chunks = [chunk async for chunk in db.iter_messages_json(conv_id, batch_size=3)]
+    assert [m["id"] for m in orjson.loads(b"[" + b",".join(chunks) + b"]")] == expected
+    assert [m["id"] for m in await db.get_messages_page(conv_id)] == expected
+
+
+@pytest.mark.asyncio
+async def test_add_message_touches_conversation(setup_db):
+    conv_id = str(uuid.uuid4())
+    await db.create_conversation(conv_id, "Touched", "/tmp", "model")
+
+    message = await db.add_message(conv_id, "user", "hello")
+
+    conversation = await db.get_conversation(conv_id)
+    assert conversation["updated_at"] == message["timestamp"]
+
+
+@pytest.mark.asyncio
+async def test_delete_conversation_removes_messages(setup_db):
+    conv_id = str(uuid.uuid4())
+    await db.create_conversation(conv_id, "Doomed", "/tmp", "model")
+    await db.add_message(conv_id, "user", "hello")
+
+    assert await db.delete_conversation(conv_id)
+
+    assert await db.get_conversation(conv_id) is None
+    assert await db.get_messages(conv_id) == []
+    # Deleting again matches nothing and leaves no transaction open
+    assert not await db.delete_conversation(conv_id)
+    assert not (await db.get_db()).in_transaction
+
+
+@pytest.mark.asyncio
+async def test_message_pagination(setup_db):
+    conv_id = str(uuid.uuid4())
+    await db.create_conversation(conv_id, "Paged", "/tmp", "model")
+    await db.add_messages_bulk(conv_id, [("user", str(i), None, None) for i in range(5)])
+
+    first = await db.get_messages_page(conv_id, limit=2)
+    rest = await db.get_messages_page(conv_id, after_id=first[-1]["id"])
+    assert [m["content"] for m in first + rest] == ["0", "1", "2", "3", "4"]
+
+    last = await db.get_last_messages(conv_id, 2)
+    assert [m["content"] for m in last] == ["3", "4"]
+
+
+@pytest.mark.asyncio
+async def test_memory_search_follows_memory_writes(setup_db):
+    workspace = f"/tmp/memories-{uuid.uuid4()}"
+    memory = await db.add_memory("Prefer Pytest fixtures", "user", workspace, tags="testing")
+    await db.add_memory("Unrelated note", "user", workspace)
+
+    for query in ("pytest", "fer pyt", "TESTING"):
+        results = await db.get_memories(workspace, search_query=query)
+        assert [m["id"] for m in results] == [memory["id"]]
+    assert await db.get_memories(workspace, search_query='say "hi"') == []
+
+    await db.delete_memory(memory["id"])
+    assert await db.get_memories(workspace, search_query="pytest") == []
+
+
+@pytest.mark.asyncio
+async def test_get_messages_can_skip_thinking_columns(setup_db):
+    conv_id = str(uuid.uuid4())
+    await db.create_conversation(conv_id, "Thinking", "/tmp", "model")
+    await db.add_message(conv_id, "assistant", "answer", "summary", "long reasoning")
+
+    (full,) = await db.get_messages(conv_id)
+    (light,) = await db.get_messages(conv_id, include_thinking=False)
+    assert full["thinking_content"] == "long reasoning"
+    assert "thinking_content" not in light
+    assert light["content"] == "answer"
+
+
+@pytest.mark.asyncio
+async def test_memory_search_case_sensitive_and_wildcards(setup_db):
+    workspace = f"/tmp/memories-{uuid.uuid4()}"
+    upper = await db.add_memory("Use PyTest [strict]", "user", workspace)
+    await db.add_memory("use pytest loosely", "user", workspace)
+    percent = await db.add_memory("coverage at 9% now", "user", workspace)
+
+    results = await db.get_memories(workspace, search_query="PyTest", case_sensitive=True)
+    assert [m["id"] for m in results] == [upper["id"]]
+    results = await db.get_memories(workspace, search_query="[s", case_sensitive=True)
+    assert [m["id"] for m in results] == [upper["id"]]
+    assert len(await db.get_memories(workspace, search_query="pytest")) == 2
+    assert [m["id"] for m in await db.get_memories(workspace, search_query="9%")] == [percent["id"]]
+    assert await db.get_memories(workspace, search_query="_t") == []
+
+
+@pytest.mark.asyncio
+async def test_bulk_memory_and_rule_imports(setup_db):
+    workspace = f"/tmp/import-{uuid.uuid4()}"
+    memories = await db.add_memories_bulk(
+        [(f"imported memory {i}", "user", workspace, None, "import") for i in range(200)]
+    )
+    assert len({m["id"] for m in memories}) == 200
+    stored = await db.get_memories(workspace, limit=500, search_query="imported memory 199")
+    assert [m["id"] for m in stored] == [memories[-1]["id"]]
+
+    rules = await db.add_global_rules_bulk([("bulk-a", "First"), ("bulk-b", "Second")])
+    text = await db.get_enabled_rules_text(workspace)
+    assert "[Global Rule: bulk-a]\nFirst" in text and "[Global Rule: bulk-b]\nSecond" in text
+    for rule in rules:
+        await db.delete_global_rule(rule["id"])
+
+
+@pytest.mark.asyncio
+async def test_get_setting_cache_follows_writes(setup_db):
+    key = f"cache_test_api_key_{uuid.uuid4().hex}"
+    assert await db.get_setting(key) is None
+
+    await db.set_setting(key, "first")
+    assert await db.get_setting(key) == "first"
+    await db.set_setting(key, "second")
+    assert await db.get_setting(key) == "second"
+
+    await db.delete_setting(key)
+    assert await db.get_setting(key) is None
+
+
+@pytest.mark.asyncio
+async def test_command_permission_cache_follows_writes(setup_db):
+    command = f"tool-{uuid.uuid4().hex}"
+    workspace = f"/tmp/perms-{uuid.uuid4()}"
+    assert await db.check_command_permission(command, workspace) is None
+
+    await db.add_command_permission(command, approved=True)
+    assert (await db.check_command_permission(command, workspace))["approved"] == 1
+
+    conn = await db.get_db()
+    await conn.execute("UPDATE command_permissions SET approved = 0 WHERE command = ?", (command,))
+    await conn.commit()
+    assert (await db.check_command_permission(command, workspace))["approved"] == 1
+    db.clear_caches()
+    assert (await db.check_command_permission(command, workspace))["approved"] == 0
+
+    await db.delete_command_permission(command)
+    assert await db.check_command_permission(command, workspace) is None
+
+
+@pytest.mark.asyncio
+async def test_iter_messages_json_matches_get_messages(setup_db):
+    conv_id = str(uuid.uuid4())
+    await db.create_conversation(conv_id, "JSON", "/tmp", "model")
+    await db.add_messages_bulk(
+        conv_id,
+        [("user", 'say "héllo"\n\\ok', None, None), ("assistant", "✓", "sum", "deep")],
+    )
+
+    batches = [batch async for batch in db.iter_messages_json(conv_id, batch_size=1)]
+
+    assert len(batches) == 2
+    assert orjson.loads(b"[" + b",".join(batches) + b"]") == await db.get_messages(conv_id)
+
+
+@pytest.mark.asyncio
+async def test_iter_messages_json_survives_concurrent_delete(setup_db):
+    conv_id = str(uuid.uuid4())
+    await db.create_conversation(conv_id, "Stream", "/tmp", "model")
+    await db.add_messages_bulk(conv_id, [("user", f"m{i}", None, None) for i in range(8)])
+    expected = await db.get_messages(conv_id)
+
+    stream = db.iter_messages_json(conv_id, batch_size=3)
+    batches = [await anext(stream)]
+    # Each batch is its own query, so the delete commits cleanly and the
+    # stream ends after the rows it had already read
+    assert await db.delete_conversation(conv_id)
+    batches += [batch async for batch in stream]
+
+    assert orjson.loads(b"[" + b",".join(batches) + b"]") == expected[:3]
+    assert await db.get_messages(conv_id) == []
@@ -0,0 +1,39 @@
+import io
+import sys
+
+import orjson
+
+from prometheus.log_writer import QueuedLogWriter
+
+
+class _FlakyStdout:
+    """Stand-in for sys.stdout whose first write fails."""
+
+    def __init__(self):
+        self.buffer = self
+        self.data = io.BytesIO()
+        self.fail_next = True
+
+    def write(self, data):
+        if self.fail_next:
+            self.fail_next = False
+            raise OSError("broken pipe")
+        return self.data.write(data)
+
+    def flush(self):
+        pass
+
+
+def test_writer_survives_write_errors_and_reports_them(monkeypatch):
+    stdout = _FlakyStdout()
+    monkeypatch.setattr(sys, "stdout", stdout)
+    writer = QueuedLogWriter(10)
+
+    writer.put(b'{"event": "lost"}')
+    writer.put(b'{"event": "kept"}')
+    writer.close()
+
+    lines = [orjson.loads(line) for line in stdout.data.getvalue().splitlines()]
+    assert {"event": "kept"} in lines
+    report = {"dropped": 0, "write_failures": 1, "event": "Log records lost", "level": "warning"}
+    assert report in lines
@@ -0,0 +1,38 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from httpx import AsyncClient
+
+from prometheus.main import _EventStreamAwareGZipMiddleware
+
+
+def _app() -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(_EventStreamAwareGZipMiddleware, minimum_size=16)
+
+    @app.get("/any/new/stream")
+    async def stream() -> StreamingResponse:
+        async def events():
+            for i in range(3):
+                yield f"data: {'x' * 64} {i}\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.get("/json")
+    async def json_body() -> dict:
+        return {"data": "x" * 4096}
+
+    return app
+
+
+@pytest.mark.asyncio
+async def test_gzip_skips_event_streams_by_content_type() -> None:
+    async with AsyncClient(app=_app(), base_url="http://test") as ac:
+        headers = {"Accept-Encoding": "gzip"}
+        stream = await ac.get("/any/new/stream", headers=headers)
+        body = await ac.get("/json", headers=headers)
+
+    assert "content-encoding" not in stream.headers
+    assert stream.text.count("data: ") == 3
+    assert body.headers["content-encoding"] == "gzip"
+    assert body.json() == {"data": "x" * 4096}
@@ -0,0 +1,113 @@
+import codecs
+import re
+
+import pytest
+
+from prometheus.mcp import tools as tools_module
+from prometheus.mcp.tools import MCPTools
+
+
+def _changes(diff, change_type):
+    return [
+        change["line"]
+        for hunk in diff["hunks"]
+        for change in hunk["changes"]
+        if change["type"] == change_type
+    ]
+
+
+def test_replace_lines_diff_keeps_unicode_separators_inline(tmp_path):
+    (tmp_path / "doc.txt").write_text(
+        "one\n\fpage two\nthree\u2028still three\nfour\n", encoding="utf-8"
+    )
+    tools = MCPTools(str(tmp_path))
+
+    result = tools.filesystem_replace_lines("doc.txt", 4, 4, "FOUR")
+
+    assert result["success"] is True
+    assert result["diff"]["stats"] == {"lines_added": 1, "lines_removed": 1, "lines_changed": 1}
+    assert _changes(result["diff"], "removed") == ["four\n"]
+    assert _changes(result["diff"], "added") == ["FOUR\n"]
+    assert "three\u2028still three\n" in _changes(result["diff"], "context")
+
+
+def test_insert_diff_keeps_unicode_separators_inline(tmp_path):
+    (tmp_path / "doc.txt").write_text("one\ntwo\n", encoding="utf-8")
+    tools = MCPTools(str(tmp_path))
+
+    result = tools.filesystem_insert("doc.txt", 2, "a\fb\u2028c")
+
+    assert result["success"] is True
+    assert _changes(result["diff"], "removed") == []
+    assert _changes(result["diff"], "added") == ["a\fb\u2028c\n"]
+    assert (tmp_path / "doc.txt").read_text(encoding="utf-8") == "one\na\fb\u2028c\ntwo\n"
+
+
+def test_grep_python_look_ahead_stops_at_line_end(tmp_path):
+    (tmp_path / "a.txt").write_text("foo\nbar\n", encoding="utf-8")
+    tools = MCPTools(str(tmp_path))
+
+    # The whole-file search sees the newline after foo; the line search does not
+    matches, files_searched, total = tools._grep_python(
+        re.compile(r"foo(?!\s)"), tmp_path, True, True, 0
+    )
+
+    assert (matches, files_searched, total) == ([{"file": "a.txt", "match_count": 1}], 1, 1)
+
+
+def test_write_converts_crlf_file_to_lf(tmp_path):
+    (tmp_path / "a.txt").write_bytes(b"a\r\nb\r\n")
+    tools = MCPTools(str(tmp_path))
+
+    result = tools.filesystem_write("a.txt", "a\nb\n")
+
+    assert result["action"] == "modified"
+    assert (tmp_path / "a.txt").read_bytes() == b"a\nb\n"
+    assert tools.filesystem_write("a.txt", "a\nb\n")["action"] == "unchanged"
+
+
+@pytest.fixture
+def grep_fixtures(tmp_path):
+    (tmp_path / "code.py").write_text(
+        "def foo():\n    return 1  \nclass Bar:\n\tpass\n\nx = [a & b]\nundef\n", encoding="utf-8"
+    )
+    (tmp_path / "crlf.txt").write_bytes(b"alpha\r\nbeta \r\nfoo\r\n")
+    (tmp_path / "utf16.txt").write_bytes(
+        codecs.BOM_UTF16_LE + "hello world\nsecond line\n".encode("utf-16-le")
+    )
+    (tmp_path / "bom8.txt").write_bytes(codecs.BOM_UTF8 + b"hello\nxyz\n")
+    (tmp_path / "blob.bin").write_bytes(b"hello\0world\n")
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / "deep.txt").write_text("deep foo\n", encoding="utf-8")
+    return tmp_path
+
+
+@pytest.mark.skipif(tools_module._RG_PATH is None, reason="ripgrep is not installed")
+@pytest.mark.parametrize(
+    "pattern",
+    [
+        r"\s",
+        r"\s$",
+        r"[^a]",
+        r"(?s)def.",
+        r"[[:alpha:]]+",
+        r"[a-z&&[^x]]",
+        r"^hello",
+        r"hello",
+        r"foo$",
+        r"beta\s*$",
+        r"&",
+    ],
+)
+@pytest.mark.parametrize("case_insensitive", [False, True])
+def test_grep_matches_with_and_without_ripgrep(
+    grep_fixtures, monkeypatch, pattern, case_insensitive
+):
+    tools = MCPTools(str(grep_fixtures))
+    kwargs = {"recursive": True, "case_insensitive": case_insensitive, "context_lines": 1}
+
+    with_rg = tools.grep(pattern, **kwargs)
+    monkeypatch.setattr(tools_module, "_RG_PATH", None)
+    without_rg = tools.grep(pattern, **kwargs)
+
+    assert with_rg == without_rg